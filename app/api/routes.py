@@ -1,8 +1,19 @@
 """API route handlers."""
 import asyncio
+import email.message
+import json
 import logging
+import random
+import time
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
 
-from fastapi import APIRouter, HTTPException, status, BackgroundTasks
+import anthropic
+import orjson
+from fastapi import APIRouter, HTTPException, Request, status, BackgroundTasks
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import Response, StreamingResponse
+from pydantic import ValidationError
+from pydantic.version import version_short as pydantic_version_short
 
 from app.config import settings
 from app.models.schemas import (
@@ -15,83 +26,583 @@ from app.models.schemas import (
     BatchStatusResponse,
     BatchJobStatus,
 )
-from app.services.ai_service import AIService, AIServiceError
+from app.services.ai_service import _BATCH_MAX_OUTPUT_TOKENS, AIService, AIServiceError
 from app.services.cache_service import cache_service
+from app.services.prompt_builder import PromptBuilder
 from app.services.batch_job_store import batch_job_store
-from app.services.rate_limiter import RateLimiter
+from app.services.rate_limiter import AdaptiveConcurrencyLimiter, RateLimiter
+from app.services.serialization import dumps
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 ai_service = AIService()
 
-# Rate limit: Claude API 50 requests/minute (configurable)
-_rate_limiter = RateLimiter(requests_per_minute=getattr(settings, "claude_requests_per_minute", 50))
+# Batch settings read once at import; the per-record hot path uses these plain values
+_MAX_TOKENS = settings.max_tokens
+_BATCH_MAX_ATTEMPTS = 1 + getattr(settings, "batch_record_retry_count", 1)
+_BATCH_INITIAL_CONCURRENCY = getattr(settings, "batch_max_concurrent_llm_calls", 5)
+_BATCH_MIN_CONCURRENCY = getattr(settings, "batch_min_concurrent_llm_calls", 1)
+_BATCH_CONCURRENCY_CEILING = getattr(settings, "batch_concurrency_ceiling", 20)
+_BATCH_LATENCY_TARGET_MS = getattr(settings, "batch_llm_latency_target_ms", None)
+_BATCH_RECORDS_PER_LLM_CALL = max(1, getattr(settings, "batch_records_per_llm_call", 1))
+_BATCH_GROUP_MAX_INPUT_TOKENS = getattr(settings, "batch_llm_group_max_input_tokens", 6000)
+# A batched call's output is capped at _BATCH_MAX_OUTPUT_TOKENS; more records than fit at
+# MAX_TOKENS each would come back as a truncated JSON array
+_BATCH_GROUP_MAX_RECORDS = max(1, _BATCH_MAX_OUTPUT_TOKENS // _MAX_TOKENS)
+# Groups with more text than this are tokenized off the event loop; smaller ones cost less
+# than the thread hop
+_TOKENIZE_OFF_LOOP_CHARS = 32 * 1024
+
+# Rate limit: Claude API 50 requests/minute and 80K tokens/minute (configurable)
+_rate_limiter = RateLimiter(
+    requests_per_minute=getattr(settings, "claude_requests_per_minute", 50),
+    tokens_per_minute=getattr(settings, "claude_tokens_per_minute", 80000),
+)
+
+
+def _record_text(structured_data: Optional[Dict[str, Any]], notes: List[str]) -> str:
+    """A record's data and notes as plain text, close to what the prompt sends (for token counting)."""
+    text = "\n".join(notes)
+    if structured_data:
+        text = dumps(structured_data).decode() + "\n" + text
+    return text
+
+
+async def _estimate_request_tokens(structured_data: Optional[Dict[str, Any]], notes: List[str]) -> int:
+    """
+    Rough input (system prefix included) + output token estimate for one LLM call (used for
+    TPM budgeting). Large records are tokenized off the event loop.
+    """
+    text = _record_text(structured_data, notes)
+    if len(text) > _TOKENIZE_OFF_LOOP_CHARS:
+        input_tokens = await asyncio.to_thread(PromptBuilder.estimate_tokens, text)
+    else:
+        input_tokens = PromptBuilder.estimate_tokens(text)
+    return PromptBuilder.static_prefix_tokens() + input_tokens + _MAX_TOKENS
+
+
+# A batch record unpacked from its request model: (structured_data, notes)
+BatchItem = Tuple[Optional[Dict[str, Any]], List[str]]
+# Records handed to one worker together (and analyzed in one LLM call): (index, item) pairs
+BatchGroup = List[Tuple[int, BatchItem]]
+# What a record's LLM step hands its in-batch duplicates: the response, the error it failed
+# with, or None when it stopped without either (cancelled)
+_LeaderOutcome = Union[AnalyzeResponse, Exception, None]
+
+
+class _PendingRecord(NamedTuple):
+    """A record of a group that needs the LLM; it owns the in-flight future for its cache key."""
+    idx: int
+    structured_data: Optional[Dict[str, Any]]
+    notes: List[str]
+    cache_key: bytes
+    future: "asyncio.Future[_LeaderOutcome]"
+    input_tokens: int
+
+
+def _to_batch_item(req: AnalyzeRequest) -> BatchItem:
+    """Unpack a validated request into plain data so workers never touch the Pydantic model."""
+    structured_data = req.structured_data.data if req.structured_data else None
+    notes = req.notes if isinstance(req.notes, list) else list(req.notes)
+    return structured_data, notes
+
+
+def _is_json_content_type(content_type: Optional[str]) -> bool:
+    """Whether FastAPI would decode a body with this Content-Type as JSON (none, application/json or */*+json)."""
+    if not content_type:
+        return True
+    message = email.message.Message()
+    message["content-type"] = content_type
+    if message.get_content_maintype() != "application":
+        return False
+    subtype = message.get_content_subtype()
+    return subtype == "json" or subtype.endswith("+json")
+
+
+def _parse_batch_body(body: bytes, content_type: Optional[str]) -> List[BatchItem]:
+    """
+    Validate a batch request body and unpack it into plain batch items.
+    Runs in a worker thread; the validated models are dropped before returning so the
+    background job holds only the unpacked data, not the body plus the model tree.
+    Valid JSON bodies take the fast path straight from bytes; anything else goes through
+    _validate_batch_body, so rejected bodies get FastAPI's own errors.
+    """
+    batch: Optional[BatchAnalyzeRequest] = None
+    if body and _is_json_content_type(content_type):
+        try:
+            batch = BatchAnalyzeRequest.model_validate_json(body)
+        except ValidationError:
+            pass
+    if batch is None:
+        batch = _validate_batch_body(body, content_type)
+    return [_to_batch_item(req) for req in batch.records]
+
+
+def _validate_batch_body(body: bytes, content_type: Optional[str]) -> BatchAnalyzeRequest:
+    """
+    Validate a batch body the way FastAPI does for a model body parameter, raising its
+    exceptions with the same details: JSON content types are decoded with the stdlib
+    (malformed JSON reports the decoder's position, undecodable bytes are a 400), other
+    content types are validated as the raw bytes, and an empty or null body is missing.
+    """
+    value: Any = None
+    if body:
+        if _is_json_content_type(content_type):
+            try:
+                value = json.loads(body)
+            except json.JSONDecodeError as e:
+                raise RequestValidationError([{
+                    "type": "json_invalid",
+                    "loc": ("body", e.pos),
+                    "msg": "JSON decode error",
+                    "input": {},
+                    "ctx": {"error": e.msg},
+                }], body=e.doc) from e
+            except Exception as e:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="There was an error parsing the body",
+                ) from e
+        else:
+            value = body
+    if value is None:
+        raise RequestValidationError([{
+            "type": "missing",
+            "loc": ("body",),
+            "msg": "Field required",
+            "input": None,
+            "url": f"https://errors.pydantic.dev/{pydantic_version_short()}/v/missing",
+        }])
+    try:
+        return BatchAnalyzeRequest.model_validate(value, from_attributes=True)
+    except ValidationError as e:
+        raise RequestValidationError([{**err, "loc": ("body", *err["loc"])} for err in e.errors()]) from e
+
+
+# Cap for the exponential retry backoff between attempts of one record (seconds)
+_RETRY_BACKOFF_MAX_SECONDS = 60.0
+
+
+def _is_fatal_error(exc: BaseException) -> bool:
+    """Errors that will fail every record the same way (bad credentials), so the batch should stop."""
+    cause = exc.__cause__ or exc
+    return isinstance(cause, (anthropic.AuthenticationError, anthropic.PermissionDeniedError))
+
+
+def _is_retryable_error(exc: BaseException) -> bool:
+    """Retry 429, 5xx and errors without an HTTP status (network, unparseable output); fail fast on other 4xx."""
+    status_code = getattr(exc, "status_code", None)
+    return status_code is None or status_code == 429 or status_code >= 500
+
+
+def _is_overload_error(exc: BaseException) -> bool:
+    """Provider signals that we are sending too much (rate limited or overloaded)."""
+    return getattr(exc, "status_code", None) in (429, 503, 529)
+
+
+def _retry_delay(exc: BaseException, attempt: int) -> float:
+    """Seconds to wait before the next attempt: provider Retry-After if given, else capped exponential backoff with jitter."""
+    retry_after = getattr(exc, "retry_after", None)
+    if retry_after is not None:
+        return retry_after
+    return min(_RETRY_BACKOFF_MAX_SECONDS, (2 ** attempt) * 0.5) * random.uniform(0.5, 1.5)
+
+
+async def _analyze_with_retries(
+    idx: int,
+    structured_data: Optional[Dict[str, Any]],
+    notes: List[str],
+    limiter: AdaptiveConcurrencyLimiter,
+) -> AnalyzeResponse:
+    """
+    Call the LLM for one record under the rate limiter and the batch's adaptive limiter,
+    retrying with backoff. Raises the last error when all attempts fail.
+    """
+    estimated_tokens = await _estimate_request_tokens(structured_data, notes)
+    attempt = 0
+    while True:
+        try:
+            await limiter.acquire()
+            try:
+                await _rate_limiter.aacquire(estimated_tokens)
+                started = time.monotonic()
+                response = await ai_service.analyze(structured_data, notes)
+                limiter.on_success((time.monotonic() - started) * 1000)
+                return response
+            except Exception as e:
+                if _is_overload_error(e):
+                    limiter.on_overload()
+                raise
+            finally:
+                await limiter.release()
+        except Exception as e:
+            attempt += 1
+            if _is_fatal_error(e) or not _is_retryable_error(e) or attempt >= _BATCH_MAX_ATTEMPTS:
+                raise
+            logger.warning("Batch record %s attempt %s failed: %s", idx, attempt, e)
+            await asyncio.sleep(_retry_delay(e, attempt - 1))
 
 
 async def _process_one_record(
     job_id: str,
     idx: int,
-    req: AnalyzeRequest,
-    sem: asyncio.Semaphore,
+    structured_data: Optional[Dict[str, Any]],
+    notes: List[str],
+    limiter: AdaptiveConcurrencyLimiter,
+    inflight: Dict[bytes, "asyncio.Future[_LeaderOutcome]"],
 ) -> None:
     """
-    Process a single record: cache check, then LLM with rate limit and concurrency limit.
+    Process a single record: cache check, then LLM with rate limit.
+    In-flight LLM calls are bounded by the batch's adaptive limiter (cache hits skip it).
+    Duplicate records in the same batch wait for the first one's call instead of making their own,
+    and share its outcome (success or failure).
     Failures are isolated—one bad record does not fail the entire batch.
     """
-    structured_data = req.structured_data.data if req.structured_data else None
-    notes = req.notes if isinstance(req.notes, list) else list(req.notes)
+    cache_key = _settle_without_llm(job_id, idx, structured_data, notes)
+    if cache_key is None:
+        return
+    leader = inflight.get(cache_key)
+    if leader is not None:
+        await _follow_leader(job_id, idx, structured_data, notes, cache_key, leader, limiter, inflight)
+        return
+    future: asyncio.Future[_LeaderOutcome] = asyncio.get_running_loop().create_future()
+    inflight[cache_key] = future
+    await _finish_record(job_id, idx, structured_data, notes, cache_key, future, limiter, inflight)
+
+
+async def _follow_leader(
+    job_id: str,
+    idx: int,
+    structured_data: Optional[Dict[str, Any]],
+    notes: List[str],
+    cache_key: bytes,
+    leader: "asyncio.Future[_LeaderOutcome]",
+    limiter: AdaptiveConcurrencyLimiter,
+    inflight: Dict[bytes, "asyncio.Future[_LeaderOutcome]"],
+) -> None:
+    """Record a duplicate with the outcome of the identical record's in-flight future (leader)."""
+    outcome = await leader
+    if isinstance(outcome, Exception):
+        # The identical record already used its retries; another call would fail the same way
+        batch_job_store.append_result(job_id, idx, False, error=str(outcome))
+        return
+    if outcome is not None:
+        tokens = getattr(outcome.metadata, "tokens_used", None) or 0
+        batch_job_store.append_result(job_id, idx, True, response=outcome, tokens_used=tokens)
+        return
+    # The identical record was cancelled before finishing; try this one on its own.
+    future: asyncio.Future[_LeaderOutcome] = asyncio.get_running_loop().create_future()
+    inflight.setdefault(cache_key, future)
+    await _finish_record(job_id, idx, structured_data, notes, cache_key, future, limiter, inflight)
+
+
+def _settle_without_llm(
+    job_id: str,
+    idx: int,
+    structured_data: Optional[Dict[str, Any]],
+    notes: List[str],
+) -> Optional[bytes]:
+    """
+    Record the result of a record that needs no LLM call (no notes, a cache hit, or a record
+    whose cache key can't be computed, which fails on its own) and return None; otherwise
+    return the record's cache key.
+    """
     if not notes:
         batch_job_store.append_result(job_id, idx, False, error="At least one note is required")
-        return
-    cached = cache_service.get(structured_data, notes)
+        return None
+    try:
+        cache_key = cache_service.make_key(structured_data, notes)
+        cached = cache_service.get(structured_data, notes, key=cache_key)
+    except Exception as e:
+        logger.error("Batch record %s failed: %s", idx, e, exc_info=e)
+        batch_job_store.append_result(job_id, idx, False, error=str(e))
+        return None
     if cached:
         tokens = getattr(cached.metadata, "tokens_used", None) or 0
         batch_job_store.append_result(job_id, idx, True, response=cached, tokens_used=tokens)
+        return None
+    return cache_key
+
+
+async def _finish_record(
+    job_id: str,
+    idx: int,
+    structured_data: Optional[Dict[str, Any]],
+    notes: List[str],
+    cache_key: bytes,
+    future: "asyncio.Future[_LeaderOutcome]",
+    limiter: AdaptiveConcurrencyLimiter,
+    inflight: Dict[bytes, "asyncio.Future[_LeaderOutcome]"],
+    response: Optional[AnalyzeResponse] = None,
+) -> None:
+    """
+    LLM step for a record that owns the in-flight future for cache_key: call the LLM
+    (unless a grouped call already produced the response), then record the result and
+    wake duplicates.
+    """
+    error: Optional[Exception] = None
+    try:
+        if response is None:
+            response = await _analyze_with_retries(idx, structured_data, notes, limiter)
+    except Exception as e:
+        error = e
+        if _is_fatal_error(e):
+            raise
+        logger.error("Batch record %s failed: %s", idx, e, exc_info=e)
+        batch_job_store.append_result(job_id, idx, False, error=str(e))
         return
-    max_attempts = 1 + getattr(settings, "batch_record_retry_count", 1)
-    last_error = None
-    for attempt in range(max_attempts):
+    finally:
+        # Wake duplicates with the response or the error; None (cancelled) lets them try themselves
+        _resolve_inflight(inflight, cache_key, future, response if error is None else error)
+    cache_service.set(structured_data, notes, response, key=cache_key)
+    tokens = getattr(response.metadata, "tokens_used", None) or 0
+    batch_job_store.append_result(job_id, idx, True, response=response, tokens_used=tokens)
+
+
+def _resolve_inflight(
+    inflight: Dict[bytes, "asyncio.Future[_LeaderOutcome]"],
+    cache_key: bytes,
+    future: "asyncio.Future[_LeaderOutcome]",
+    outcome: _LeaderOutcome,
+) -> None:
+    """Hand a record's outcome to the duplicates waiting on its future and stop new ones from joining."""
+    future.set_result(outcome)
+    if inflight.get(cache_key) is future:
+        del inflight[cache_key]
+
+
+async def _analyze_group(
+    group: List[_PendingRecord],
+    limiter: AdaptiveConcurrencyLimiter,
+) -> List[AnalyzeResponse]:
+    """
+    One LLM call for several records, taking a single slot of the batch's adaptive limiter
+    and budgeting the group's tokens with the rate limiter. Not retried: on failure the
+    caller falls back to per-record calls.
+    """
+    # The system prefix is sent once per call, however many records share it
+    estimated_tokens = (
+        PromptBuilder.static_prefix_tokens()
+        + sum(record.input_tokens for record in group)
+        + _MAX_TOKENS * len(group)
+    )
+    await limiter.acquire()
+    try:
+        await _rate_limiter.aacquire(estimated_tokens)
+        started = time.monotonic()
+        responses = await ai_service.analyze_batch([(r.structured_data, r.notes) for r in group])
+        # Per-record latency, so the optional latency target means the same as for single calls
+        limiter.on_success((time.monotonic() - started) * 1000 / len(group))
+        return responses
+    except Exception as e:
+        if _is_overload_error(e):
+            limiter.on_overload()
+        raise
+    finally:
+        await limiter.release()
+
+
+def _split_by_input_budget(records: List[_PendingRecord]) -> List[List[_PendingRecord]]:
+    """
+    Split records into consecutive groups whose estimated input fits _BATCH_GROUP_MAX_INPUT_TOKENS
+    and whose output fits one call (at most _BATCH_GROUP_MAX_RECORDS records).
+    """
+    groups: List[List[_PendingRecord]] = []
+    current: List[_PendingRecord] = []
+    budget = 0
+    for record in records:
+        if current and (
+            budget + record.input_tokens > _BATCH_GROUP_MAX_INPUT_TOKENS
+            or len(current) >= _BATCH_GROUP_MAX_RECORDS
+        ):
+            groups.append(current)
+            current, budget = [], 0
+        current.append(record)
+        budget += record.input_tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+async def _analyze_and_finish_group(
+    job_id: str,
+    group: List[_PendingRecord],
+    limiter: AdaptiveConcurrencyLimiter,
+    inflight: Dict[bytes, "asyncio.Future[_LeaderOutcome]"],
+    tg: asyncio.TaskGroup,
+) -> None:
+    """Analyze a group in one call, then finish each record in tg; records of a failed call retry on their own."""
+    responses: List[Optional[AnalyzeResponse]] = [None] * len(group)
+    if len(group) > 1:
         try:
-            async with sem:
-                await _rate_limiter.acquire()
-                response = await ai_service.analyze(structured_data, notes)
-            cache_service.set(structured_data, notes, response)
-            tokens = getattr(response.metadata, "tokens_used", None) or 0
-            batch_job_store.append_result(job_id, idx, True, response=response, tokens_used=tokens)
-            return
+            responses = await _analyze_group(group, limiter)
         except Exception as e:
-            last_error = e
-            logger.warning("Batch record %s attempt %s failed: %s", idx, attempt + 1, e)
-    logger.exception("Batch record %s failed after %s attempts", idx, max_attempts)
-    batch_job_store.append_result(job_id, idx, False, error=str(last_error))
+            if _is_fatal_error(e):
+                raise
+            logger.warning(
+                "Grouped LLM call for batch records %s failed, retrying them individually: %s",
+                [record.idx for record in group], e,
+            )
+    for record, response in zip(group, responses):
+        tg.create_task(_finish_record(
+            job_id, record.idx, record.structured_data, record.notes,
+            record.cache_key, record.future, limiter, inflight, response=response,
+        ))
+
+
+async def _process_record_group(
+    job_id: str,
+    group: BatchGroup,
+    limiter: AdaptiveConcurrencyLimiter,
+    inflight: Dict[bytes, "asyncio.Future[_LeaderOutcome]"],
+) -> None:
+    """
+    Process records that share LLM calls (batch_records_per_llm_call > 1).
+    Missing notes, cache hits and duplicates are handled per record as in _process_one_record;
+    the rest are analyzed together in calls that fit the input-token budget. A single record
+    takes the per-record path.
+    """
+    if len(group) == 1:
+        idx, (structured_data, notes) = group[0]
+        await _process_one_record(job_id, idx, structured_data, notes, limiter, inflight)
+        return
+    loop = asyncio.get_running_loop()
+    needs_llm: List[Tuple[int, Optional[Dict[str, Any]], List[str], bytes, asyncio.Future]] = []
+    # Same fields for duplicates, with their leader's future
+    duplicates: List[Tuple[int, Optional[Dict[str, Any]], List[str], bytes, asyncio.Future]] = []
+    for idx, (structured_data, notes) in group:
+        cache_key = _settle_without_llm(job_id, idx, structured_data, notes)
+        if cache_key is None:
+            continue
+        leader = inflight.get(cache_key)
+        if leader is not None:
+            duplicates.append((idx, structured_data, notes, cache_key, leader))
+            continue
+        future: asyncio.Future[_LeaderOutcome] = loop.create_future()
+        inflight[cache_key] = future
+        needs_llm.append((idx, structured_data, notes, cache_key, future))
+    try:
+        # Token counts for the call boundaries, tokenized together in one batch. Large groups
+        # are tokenized in a worker thread (the encoder releases the GIL) so other jobs keep running.
+        texts = [_record_text(structured_data, notes) for _, structured_data, notes, _, _ in needs_llm]
+        if sum(map(len, texts)) > _TOKENIZE_OFF_LOOP_CHARS:
+            token_counts = await asyncio.to_thread(PromptBuilder.estimate_tokens_batch, texts)
+        else:
+            token_counts = PromptBuilder.estimate_tokens_batch(texts)
+        pending = [_PendingRecord(*fields, tokens) for fields, tokens in zip(needs_llm, token_counts)]
+        record_groups = _split_by_input_budget(pending)
+    except Exception as e:
+        # These records own in-flight futures: fail them, and through the futures their
+        # duplicates, instead of the batch
+        logger.error("Batch records %s failed: %s", [fields[0] for fields in needs_llm], e, exc_info=e)
+        for idx, _, _, cache_key, future in needs_llm:
+            batch_job_store.append_result(job_id, idx, False, error=str(e))
+            _resolve_inflight(inflight, cache_key, future, e)
+        record_groups = []
+    try:
+        async with asyncio.TaskGroup() as tg:
+            for records in record_groups:
+                tg.create_task(_analyze_and_finish_group(job_id, records, limiter, inflight, tg))
+            # Duplicates wait for the leader they found (possibly in this group), even if it
+            # has already finished and left inflight
+            for idx, structured_data, notes, cache_key, leader in duplicates:
+                tg.create_task(_follow_leader(
+                    job_id, idx, structured_data, notes, cache_key, leader, limiter, inflight
+                ))
+    except ExceptionGroup as eg:
+        # Only fatal errors escape; re-raise the first so the batch fails with its message
+        raise eg.exceptions[0]
+
+
+async def _feed_batch_queue(
+    queue: "asyncio.Queue[Optional[BatchGroup]]",
+    items: Iterable[BatchItem],
+    worker_count: int,
+    group_size: int = 1,
+) -> None:
+    """Producer: enqueue records in groups of up to group_size as workers free up, then one None sentinel per worker."""
+    group: BatchGroup = []
+    for idx, item in enumerate(items):
+        group.append((idx, item))
+        if len(group) >= group_size:
+            await queue.put(group)
+            group = []
+    if group:
+        await queue.put(group)
+    for _ in range(worker_count):
+        await queue.put(None)
+
+
+async def _batch_worker(
+    job_id: str,
+    total_records: int,
+    queue: "asyncio.Queue[Optional[BatchGroup]]",
+    limiter: AdaptiveConcurrencyLimiter,
+    inflight: Dict[bytes, "asyncio.Future[_LeaderOutcome]"],
+) -> None:
+    """Pull record groups from the shared queue until the end sentinel; logs each finished record."""
+    while True:
+        group = await queue.get()
+        if group is None:
+            return
+        await _process_record_group(job_id, group, limiter, inflight)
+        for idx, _ in group:
+            logger.info("Batch job %s record %s/%s finished", job_id, idx + 1, total_records)
 
 
-async def _process_batch(job_id: str, records: list[AnalyzeRequest]) -> None:
+async def _process_batch(
+    job_id: str,
+    total_records: int,
+    items: Optional[List[BatchItem]] = None,
+) -> None:
     """
     Background task: process records with configurable concurrency and rate limiting.
     - Respects Claude API rate limit (50 req/min).
-    - Max concurrent LLM calls is configurable.
+    - Concurrent LLM calls adapt (AIMD) from the configured start value within [min, ceiling].
     - Handles failures gracefully—one bad record does not fail the entire batch.
+    - Fatal errors (e.g. invalid API key) cancel remaining work and mark the job failed.
     - Partial results are available before completion (persisted when backend=file).
+    - With batch_records_per_llm_call > 1, records are grouped so one LLM call analyzes several.
+    With items=None the records are streamed from the job's pending records on disk
+    (file backend), so the full batch is never held in memory.
     """
     batch_job_store.set_processing(job_id)
-    concurrency = getattr(settings, "batch_max_concurrent_llm_calls", 5)
-    sem = asyncio.Semaphore(concurrency)
+    limiter = AdaptiveConcurrencyLimiter(
+        initial=_BATCH_INITIAL_CONCURRENCY,
+        minimum=_BATCH_MIN_CONCURRENCY,
+        maximum=_BATCH_CONCURRENCY_CEILING,
+        latency_target_ms=_BATCH_LATENCY_TARGET_MS,
+    )
+    # One worker per possible slot (each handles a group of records); the limiter decides
+    # how many call the LLM at once.
+    group_count = -(-total_records // _BATCH_RECORDS_PER_LLM_CALL)
+    worker_count = max(1, min(_BATCH_CONCURRENCY_CEILING, group_count))
+    # Bounded so pending records stay on disk until a worker is about to need them
+    queue: asyncio.Queue[Optional[BatchGroup]] = asyncio.Queue(maxsize=worker_count)
+    source = items if items is not None else batch_job_store.iter_pending_records(job_id)
+    # Cache key -> pending LLM result, shared so duplicate records in this batch coalesce
+    inflight: Dict[bytes, asyncio.Future[_LeaderOutcome]] = {}
     try:
-        await asyncio.gather(
-            *[_process_one_record(job_id, idx, req, sem) for idx, req in enumerate(records)]
-        )
-    except Exception as e:
-        logger.exception("Batch job %s fatal error: %s", job_id, e)
+        # Per-record errors are handled inside _process_one_record; anything escaping a worker
+        # is fatal, and the TaskGroup cancels the sibling workers immediately.
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(_feed_batch_queue(queue, source, worker_count, _BATCH_RECORDS_PER_LLM_CALL))
+            for _ in range(worker_count):
+                tg.create_task(_batch_worker(job_id, total_records, queue, limiter, inflight))
+    except ExceptionGroup as eg:
+        e = eg.exceptions[0]
+        logger.error("Batch job %s fatal error: %s", job_id, e, exc_info=e)
         batch_job_store.set_job_failed(job_id, message=str(e))
         return
+    finally:
+        batch_job_store.discard_pending_records(job_id)
     batch_job_store.set_job_completed(job_id)
     logger.info("Batch job %s completed", job_id)
 
 
 @router.post("/analyze", response_model=AnalyzeResponse, status_code=status.HTTP_200_OK)
-async def analyze(request: AnalyzeRequest) -> AnalyzeResponse:
+async def analyze(request: AnalyzeRequest) -> Response:
     """
     Analyze structured data and free-text notes.
     
@@ -114,19 +625,23 @@ async def analyze(request: AnalyzeRequest) -> AnalyzeResponse:
         structured_data = request.structured_data.data if request.structured_data else None
         notes = request.notes if isinstance(request.notes, list) else [request.notes]
         
-        # Check cache first
-        cached_response = cache_service.get(structured_data, notes)
-        if cached_response:
+        # Check cache first (key is computed once and reused for set). Responses are sent as
+        # their JSON bytes: a cache hit is never rebuilt into a model, and FastAPI's
+        # response_model validation and re-encoding are skipped.
+        cache_key = cache_service.make_key(structured_data, notes)
+        cached_json = cache_service.get_json(structured_data, notes, key=cache_key)
+        if cached_json:
             logger.info("Returning cached response")
-            return cached_response
+            return Response(content=cached_json, media_type="application/json")
         
         # Process with AI service
         response = await ai_service.analyze(structured_data, notes)
         
-        # Cache the response
-        cache_service.set(structured_data, notes, response)
+        # Serialize once for both the cache and the client
+        body = response.model_dump_json().encode()
+        cache_service.set_json(structured_data, notes, body, key=cache_key)
         
-        return response
+        return Response(content=body, media_type="application/json")
         
     except HTTPException:
         raise
@@ -144,14 +659,26 @@ async def analyze(request: AnalyzeRequest) -> AnalyzeResponse:
         )
 
 
+# Request body schema for /batch/analyze (the handler reads the raw body, so FastAPI cannot infer it).
+# Nested models resolve to components already registered by /analyze.
+_BATCH_REQUEST_SCHEMA = BatchAnalyzeRequest.model_json_schema(ref_template="#/components/schemas/{model}")
+_BATCH_REQUEST_SCHEMA.pop("$defs", None)
+
+
 @router.post(
     "/batch/analyze",
     response_model=BatchJobResponse,
     status_code=status.HTTP_202_ACCEPTED,
     summary="Submit batch analysis",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": _BATCH_REQUEST_SCHEMA}},
+        }
+    },
 )
 async def batch_analyze(
-    request: BatchAnalyzeRequest,
+    request: Request,
     background_tasks: BackgroundTasks,
 ) -> BatchJobResponse:
     """
@@ -159,15 +686,22 @@ async def batch_analyze(
 
     Returns immediately with a job_id. Process completes within ~30 minutes for 500 records.
     Use GET /api/v1/batch/{job_id}/status to track progress and retrieve results.
+    The body is validated in a worker thread so large batches do not block the event loop.
     """
-    records = request.records
-    job_id = batch_job_store.create_job(total_records=len(records))
-    background_tasks.add_task(_process_batch, job_id, records)
-    logger.info("Batch job %s submitted with %s records", job_id, len(records))
+    body = await request.body()
+    items = await asyncio.to_thread(_parse_batch_body, body, request.headers.get("content-type"))
+    total_records = len(items)
+    job_id = batch_job_store.create_job(total_records=total_records)
+    # On the file backend the records go to disk and the job streams them back, so nothing
+    # from this request stays referenced after the handler returns.
+    if await asyncio.to_thread(batch_job_store.persist_pending_records, job_id, items):
+        items = None
+    background_tasks.add_task(_process_batch, job_id, total_records, items)
+    logger.info("Batch job %s submitted with %s records", job_id, total_records)
     return BatchJobResponse(
         job_id=job_id,
         status=BatchJobStatus.ACCEPTED,
-        total_records=len(records),
+        total_records=total_records,
         message="Batch accepted. Use GET /api/v1/batch/{job_id}/status to track progress.",
     )
 
@@ -177,19 +711,71 @@ async def batch_analyze(
     response_model=BatchStatusResponse,
     summary="Get batch job status and progress",
 )
-async def batch_status(job_id: str) -> BatchStatusResponse:
+async def batch_status(job_id: str, include_results: bool = True) -> Response:
     """
     Get progress and results for a batch job.
 
     Returns completed_count, failed_count, progress_percent, and results when available.
+    Pass include_results=false for a cheap progress-only poll.
     """
-    data = batch_job_store.get_status_response(job_id)
+    # Stored responses are embedded as their JSON bytes, so results are never decoded and
+    # revalidated into models just to be encoded again. OPT_UTC_Z matches pydantic's datetimes.
+    data = batch_job_store.get_status_response(
+        job_id, include_results=include_results, encoded_results=True
+    )
     if not data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Job not found: {job_id}",
         )
-    return BatchStatusResponse(**data)
+    return Response(content=orjson.dumps(data, option=orjson.OPT_UTC_Z), media_type="application/json")
+
+
+# Job statuses after which no more progress events are published
+_TERMINAL_STATUSES = {BatchJobStatus.COMPLETED.value, BatchJobStatus.FAILED.value}
+# Seconds between SSE keep-alive comments while a job is idle
+_SSE_KEEPALIVE_SECONDS = 15.0
+
+
+@router.get(
+    "/batch/{job_id}/events",
+    summary="Stream batch job progress (Server-Sent Events)",
+)
+async def batch_events(job_id: str) -> StreamingResponse:
+    """
+    Stream progress for a batch job as Server-Sent Events instead of polling /status.
+
+    Sends a `status` event with current counts first, then one `result` event per finished
+    record and a final `status` event when the job completes or fails.
+    """
+    if not batch_job_store.get_job(job_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job not found: {job_id}",
+        )
+    queue = batch_job_store.subscribe(job_id)
+
+    async def event_stream():
+        try:
+            event = batch_job_store.status_event(job_id)
+            while True:
+                yield b"data: " + orjson.dumps(event) + b"\n\n"
+                if event["event"] == "status" and event["status"] in _TERMINAL_STATUSES:
+                    return
+                while True:
+                    try:
+                        event = await asyncio.wait_for(queue.get(), timeout=_SSE_KEEPALIVE_SECONDS)
+                        break
+                    except asyncio.TimeoutError:
+                        yield b": keep-alive\n\n"
+        finally:
+            batch_job_store.unsubscribe(job_id, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
 
 
 @router.get(
@@ -241,13 +827,8 @@ async def readiness_check():
                 detail=f"Storage not ready: {err}",
             )
     elif backend == "sqlite":
-        sqlite_path = Path(getattr(settings, "batch_sqlite_path", "data/batch.db"))
         try:
-            sqlite_path.parent.mkdir(parents=True, exist_ok=True)
-            import sqlite3
-            conn = sqlite3.connect(str(sqlite_path))
-            conn.execute("SELECT 1")
-            conn.close()
+            batch_job_store.ping()
         except Exception as err:
             logger.warning("Readiness check (sqlite) failed: %s", err)
             raise HTTPException(
@@ -1,6 +1,6 @@
 """Configuration management for the application."""
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Optional
+from typing import List, Optional
 
 
 class Settings(BaseSettings):
@@ -11,22 +11,40 @@ class Settings(BaseSettings):
     claude_model: str = "claude-3-5-haiku-20241022"
     max_tokens: int = 1200  # Reduced for faster responses
     temperature: float = 0.3  # Lower for faster, more deterministic responses
+    # Few-shot examples in the system prompt. None = only when the prompt is long enough for the
+    # model's prompt cache; below that minimum they would be billed in full on every call.
+    prompt_few_shot_examples: Optional[bool] = None
     
     # Cache Configuration
     enable_cache: bool = True
     cache_ttl_seconds: int = 3600
+    # Max cached responses; when full, the least recently used unexpired entry is evicted
+    cache_max_entries: int = 10000
 
     # Batch processing (enterprise rules)
     # Claude API rate limit: 50 requests/minute — we throttle to this
     claude_requests_per_minute: int = 50
-    # Maximum concurrent LLM calls per batch (configurable; lower = safer for rate limits)
+    # Claude API token limit: 80K input+output tokens/minute — budgeted alongside requests/minute
+    claude_tokens_per_minute: int = 80000
+    # Concurrent LLM calls per batch at start (configurable; lower = safer for rate limits).
+    # Adapts (AIMD) between the min and ceiling below: +0.5 per success, halved on 429/overload.
     batch_max_concurrent_llm_calls: int = 5
+    batch_min_concurrent_llm_calls: int = 1
+    batch_concurrency_ceiling: int = 20
+    # Optional p95 LLM latency target (ms); above it concurrency shrinks as on overload. None = off.
+    batch_llm_latency_target_ms: Optional[float] = None
+    # Records packed into one LLM call (one system prompt shared by the group). 1 = one call per record.
+    # Groups are split further so each call's input stays within batch_llm_group_max_input_tokens.
+    batch_records_per_llm_call: int = 1
+    batch_llm_group_max_input_tokens: int = 6000
     # Persistence: "memory" (dev) | "file" (JSON files) | "sqlite" (table persistence)
     batch_persistence_backend: str = "memory"
     # Directory for file persistence (used when batch_persistence_backend=file)
     batch_job_storage_path: str = "data/batch_jobs"
     # SQLite DB path for table persistence (used when batch_persistence_backend=sqlite)
     batch_sqlite_path: str = "data/batch.db"
+    # Finished jobs kept in memory for status polls (file/sqlite only; older ones reload from storage)
+    batch_max_cached_finished_jobs: int = 128
     # Retries per record before marking failed (graceful failure: one bad record doesn't fail batch)
     batch_record_retry_count: int = 1
     # Optional: cost per 1K input/output tokens for cost tracking (Anthropic pricing; set for estimated_cost)
@@ -36,6 +54,14 @@ class Settings(BaseSettings):
     # Server Configuration
     host: str = "0.0.0.0"
     port: int = 8000
+    # Auto-reload on code changes (development only; keep off in containers)
+    reload: bool = False
+    # Browser origins allowed by CORS (JSON list in env, e.g. CORS_ORIGINS='["https://app.example.com"]')
+    cors_origins: List[str] = [
+        "http://localhost:8080",
+        "http://127.0.0.1:8080",
+        "http://localhost:3000",
+    ]
     
     model_config = SettingsConfigDict(
         env_file=".env",
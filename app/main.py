@@ -1,8 +1,11 @@
 """Main FastAPI application."""
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes import router
 from app.config import settings
+from app.services import prompt_builder
 import logging
 
 # Configure logging
@@ -10,21 +13,45 @@ logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 )
+logger = logging.getLogger(__name__)
+
+# How long startup waits for the first tokenizer load before serving with the fallback estimate
+_TOKENIZER_STARTUP_WAIT_SECONDS = 10.0
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Load the tokenizer and measure the prompt prefix off the event loop. Startup waits
+    briefly for the first attempt; if the load stalls or fails, requests use the
+    4-characters-per-token estimate while it keeps retrying in the background.
+    """
+    first_attempt = asyncio.Event()
+    warm_up = asyncio.create_task(prompt_builder.warm_up(first_attempt))
+    try:
+        await asyncio.wait_for(first_attempt.wait(), timeout=_TOKENIZER_STARTUP_WAIT_SECONDS)
+    except asyncio.TimeoutError:
+        logger.warning("Tokenizer still loading; estimating 4 characters per token until it is ready")
+    yield
+    warm_up.cancel()
+
 
 # Create FastAPI app
 app = FastAPI(
     title="Smart Summary & Insight Service",
     description="AI-powered assistant for analyzing structured data and unstructured notes",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
-# Add CORS middleware
+# Add CORS middleware (explicit allowlist; browsers cache preflights for max_age seconds)
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # Configure appropriately for production
+    allow_origins=settings.cors_origins,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST"],
+    allow_headers=["Content-Type", "Authorization"],
+    max_age=86400,
 )
 
 # Include routers
@@ -41,6 +68,7 @@ async def root():
             "analyze": "/api/v1/analyze",
             "batch_analyze": "/api/v1/batch/analyze",
             "batch_status": "/api/v1/batch/{job_id}/status",
+            "batch_events": "/api/v1/batch/{job_id}/events",
             "health": "/api/v1/health",
             "ready": "/api/v1/ready",
             "docs": "/docs"
@@ -54,6 +82,9 @@ if __name__ == "__main__":
         "app.main:app",
         host=settings.host,
         port=settings.port,
-        reload=True
+        # uvloop when installed (not on Windows), else the asyncio loop
+        loop="auto",
+        http="httptools",
+        reload=settings.reload
     )
 
@@ -1,13 +1,18 @@
 """Pydantic models for API request/response validation."""
 from pydantic import BaseModel, Field, field_validator
 from typing import List, Dict, Any, Optional
-from datetime import datetime
+from datetime import datetime, timezone
 from enum import Enum
 
 # Maximum records per batch (30 min target for 500 records)
 BATCH_MAX_RECORDS = 500
 
 
+def _utc_now() -> datetime:
+    """Timezone-aware current UTC time (datetime.utcnow is deprecated and naive)."""
+    return datetime.now(timezone.utc)
+
+
 class StructuredData(BaseModel):
     """Structured JSON data input."""
     data: Dict[str, Any] = Field(
@@ -31,9 +36,10 @@ class AnalyzeRequest(BaseModel):
     @classmethod
     def validate_notes(cls, v):
         """Ensure notes is always a list for consistent processing."""
-        if isinstance(v, str):
+        # Items are already validated as str, so a single strip() per note is enough.
+        if v.__class__ is str:
             return [v] if v.strip() else []
-        return [note for note in v if note and note.strip()]
+        return [note for note in v if note.strip()]
 
 
 class Insight(BaseModel):
@@ -62,7 +68,7 @@ class Metadata(BaseModel):
     model_version: str = Field(..., description="LLM model version used")
     processing_time_ms: Optional[float] = Field(None, description="Processing time in milliseconds")
     tokens_used: Optional[int] = Field(None, description="Number of tokens used")
-    timestamp: datetime = Field(default_factory=datetime.utcnow, description="Analysis timestamp")
+    timestamp: datetime = Field(default_factory=_utc_now, description="Analysis timestamp")
 
 
 class AnalyzeResponse(BaseModel):
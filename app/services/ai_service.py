@@ -1,19 +1,72 @@
 """AI service for LLM interactions with pluggable provider design."""
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
+import functools
 import time
-import json
-from anthropic import Anthropic
+import re
+import orjson
+from anthropic import (
+    AsyncAnthropic,
+    APIStatusError,
+    DEFAULT_CONNECTION_LIMITS,
+    DefaultAsyncHttpxClient,
+    Timeout,
+)
 from app.config import settings
 from app.services.prompt_builder import PromptBuilder
 from app.models.schemas import AnalyzeResponse, Insight, NextAction, Metadata
 
+# Fallback patterns for LLM output that wraps the JSON in a markdown code block (compiled once)
+_JSON_BLOCK_RE = re.compile(r'```(?:json)?\s*(\{.*?\})\s*```', re.DOTALL)
+_JSON_ARRAY_BLOCK_RE = re.compile(r'```(?:json)?\s*(\[.*?\])\s*```', re.DOTALL)
+
+# Connection limits type of the HTTP library the installed SDK is built on (httpx or httpx2)
+_Limits = type(DEFAULT_CONNECTION_LIMITS)
+
+# Output token cap for one batched call (max output of current Claude models)
+_BATCH_MAX_OUTPUT_TOKENS = 8192
+
+
+@functools.lru_cache(maxsize=2)
+def _system_blocks(static_prefix: str) -> List[Dict[str, Any]]:
+    """
+    System blocks for every call, built once per prefix: the static prefix marked cacheable
+    so repeated calls read it from the provider's prompt cache. Shared across calls; never mutate.
+    """
+    return [
+        {
+            "type": "text",
+            "text": static_prefix,
+            "cache_control": {"type": "ephemeral"}
+        }
+    ]
+
+
+# Input token budget for one analyze call: static prefix plus user prompt (kept small for speed)
+_MAX_INPUT_TOKENS = 8000
+
 
 class AIService:
     """Service for interacting with LLM providers (pluggable design)."""
     
     def __init__(self):
         """Initialize AI service with Claude API client."""
-        self.client = Anthropic(api_key=settings.anthropic_api_key)
+        # One pooled async HTTP/2 client for the process: calls are awaited instead of
+        # blocking the event loop, and batch calls reuse connections instead of paying a
+        # TCP+TLS handshake each. Sized to the adaptive concurrency ceiling. Built with the
+        # SDK's DefaultAsyncHttpxClient, which newer SDK releases require for http_client;
+        # limits and timeout use the SDK's own types so they match its HTTP library.
+        pool_size = max(1, settings.batch_max_concurrent_llm_calls, settings.batch_concurrency_ceiling)
+        self.client = AsyncAnthropic(
+            api_key=settings.anthropic_api_key,
+            timeout=Timeout(60.0, connect=5.0),
+            http_client=DefaultAsyncHttpxClient(
+                http2=True,
+                limits=_Limits(
+                    max_connections=pool_size * 2,
+                    max_keepalive_connections=pool_size,
+                ),
+            ),
+        )
         self.model = settings.claude_model
         self.max_tokens = settings.max_tokens
         self.temperature = settings.temperature
@@ -36,93 +89,145 @@ class AIService:
         """
         start_time = time.time()
         
-        # Build prompts with context management
-        system_prompt = self.prompt_builder.SYSTEM_PROMPT
+        # Build prompts with context management (static prefix as system, request data only in the user message)
         user_prompt = self.prompt_builder.build_user_prompt(structured_data, notes)
         
-        # Manage context size - truncate if needed (optimized for speed)
+        # Manage context size - truncate if needed (optimized for speed); the prefix's
+        # share of the budget is a precomputed constant
         user_prompt = self.prompt_builder.truncate_if_needed(
             user_prompt,
-            max_tokens=6000  # Reduced for faster processing
+            max_tokens=self.prompt_builder.remaining_budget(_MAX_INPUT_TOKENS)
         )
         
         try:
-            # Call Claude API using messages API (newer SDK versions)
-            if hasattr(self.client, 'messages'):
-                # New messages API
-                message = self.client.messages.create(
-                    model=self.model,
-                    max_tokens=self.max_tokens,
-                    temperature=self.temperature,
-                    system=system_prompt,
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": user_prompt
-                        }
-                    ]
-                )
-                # Extract response text - handle different block types safely
-                response_text = ""
-                for block in message.content:
-                    # Use getattr to safely access text attribute (only TextBlock has it)
-                    # Type checker may complain, but getattr handles missing attributes safely
-                    text_content = getattr(block, 'text', None)  # type: ignore
-                    if text_content and isinstance(text_content, str):
-                        response_text += text_content
-                
-                if not response_text:
-                    raise AIServiceError("No text content found in API response")
-                
-                api_response = message
-            else:
-                # Fallback to completions API (older SDK versions)
-                full_prompt = f"{system_prompt}\n\n{user_prompt}"
-                completion = self.client.completions.create(
-                    model=self.model,
-                    max_tokens_to_sample=self.max_tokens,
-                    temperature=self.temperature,
-                    prompt=full_prompt
-                )
-                response_text = completion.completion
-                api_response = completion
+            response_text, api_response = await self._create_message(
+                user_prompt, self.max_tokens
+            )
             
             # Parse JSON response
             try:
-                parsed_response = json.loads(response_text)
-            except json.JSONDecodeError:
+                parsed_response = orjson.loads(response_text)
+            except orjson.JSONDecodeError:
                 # Fallback: try to extract JSON from markdown code blocks
                 response_text = self._extract_json_from_markdown(response_text)
-                parsed_response = json.loads(response_text)
+                parsed_response = orjson.loads(response_text)
             
             # Calculate processing time
             processing_time_ms = (time.time() - start_time) * 1000
             
             # Build response model
-            return self._build_response(parsed_response, processing_time_ms, api_response)
+            return self._build_response(
+                parsed_response, processing_time_ms, _tokens_used(api_response)
+            )
             
         except Exception as e:
-            # Enhanced error handling
-            raise AIServiceError(f"Failed to analyze data: {str(e)}") from e
+            raise _service_error(e) from e
     
-    def _extract_json_from_markdown(self, text: str) -> str:
-        """Extract JSON from markdown code blocks if present."""
-        import re
-        # Try to find JSON in code blocks
-        json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', text, re.DOTALL)
-        if json_match:
-            return json_match.group(1)
-        # Try to find JSON object directly
-        json_match = re.search(r'\{.*\}', text, re.DOTALL)
-        if json_match:
-            return json_match.group(0)
+    async def analyze_batch(
+        self,
+        records: List[Tuple[Optional[Dict[str, Any]], List[str]]]
+    ) -> List[AnalyzeResponse]:
+        """
+        Analyze several records in one LLM call (system prompt sent once for all of them).
+        
+        Args:
+            records: (structured_data, notes) per record
+            
+        Returns:
+            One AnalyzeResponse per record, in order. Token usage of the call is split
+            across the records. The prompt is not truncated: callers keep the group small.
+        """
+        start_time = time.time()
+        user_prompt = self.prompt_builder.build_batched_user_prompt(records)
+        max_tokens = min(self.max_tokens * len(records), _BATCH_MAX_OUTPUT_TOKENS)
+        
+        try:
+            response_text, api_response = await self._create_message(
+                user_prompt, max_tokens
+            )
+            try:
+                parsed_list = orjson.loads(response_text)
+            except orjson.JSONDecodeError:
+                response_text = self._extract_json_from_markdown(response_text, array=True)
+                parsed_list = orjson.loads(response_text)
+            if not isinstance(parsed_list, list) or len(parsed_list) != len(records):
+                raise AIServiceError(
+                    f"Expected a JSON array of {len(records)} analyses, got "
+                    f"{len(parsed_list) if isinstance(parsed_list, list) else type(parsed_list).__name__}"
+                )
+            
+            processing_time_ms = (time.time() - start_time) * 1000
+            total_tokens = _tokens_used(api_response)
+            responses = []
+            for i, parsed in enumerate(parsed_list):
+                tokens_used = None
+                if total_tokens is not None:
+                    # Even split; the remainder goes to the first records so the sum is exact
+                    tokens_used = total_tokens // len(records) + (1 if i < total_tokens % len(records) else 0)
+                responses.append(self._build_response(parsed, processing_time_ms, tokens_used))
+            return responses
+            
+        except Exception as e:
+            raise _service_error(e) from e
+    
+    async def _create_message(
+        self,
+        user_prompt: str,
+        max_tokens: int
+    ) -> Tuple[str, Any]:
+        """
+        Send one messages API call with the static system blocks; returns the concatenated
+        response text and the raw message.
+        """
+        # Call Claude API using the messages API (awaited; does not block the event loop)
+        message = await self.client.messages.create(
+            model=self.model,
+            max_tokens=max_tokens,
+            temperature=self.temperature,
+            system=_system_blocks(self.prompt_builder.get_static_prefix()),
+            messages=[
+                {
+                    "role": "user",
+                    "content": user_prompt
+                }
+            ]
+        )
+        # Extract response text - handle different block types safely
+        response_text = ""
+        for block in message.content:
+            # Use getattr to safely access text attribute (only TextBlock has it)
+            # Type checker may complain, but getattr handles missing attributes safely
+            text_content = getattr(block, 'text', None)  # type: ignore
+            if text_content and isinstance(text_content, str):
+                response_text += text_content
+        
+        if not response_text:
+            raise AIServiceError("No text content found in API response")
+        
+        return response_text, message
+    
+    def _extract_json_from_markdown(self, text: str, array: bool = False) -> str:
+        """Extract a JSON object (or array, for batched responses) from markdown code blocks if present."""
+        block_re, open_char, close_char = (
+            (_JSON_ARRAY_BLOCK_RE, "[", "]") if array else (_JSON_BLOCK_RE, "{", "}")
+        )
+        # Try to find JSON in code blocks (skip the regex when there is no fence)
+        if "```" in text:
+            json_match = block_re.search(text)
+            if json_match:
+                return json_match.group(1)
+        # Try to find JSON directly: first opening through last closing bracket (linear scan)
+        start = text.find(open_char)
+        end = text.rfind(close_char)
+        if start != -1 and end > start:
+            return text[start:end + 1]
         raise ValueError("Could not extract JSON from response")
     
     def _build_response(
         self,
         parsed: Dict[str, Any],
         processing_time_ms: float,
-        api_message: Any
+        tokens_used: Optional[int]
     ) -> AnalyzeResponse:
         """Build AnalyzeResponse from parsed LLM output."""
         # Extract insights
@@ -147,18 +252,6 @@ class AIService:
         ]
         
         # Build metadata
-        # Extract token usage safely (completions API may not have usage info)
-        # Try to get it from the response object
-        tokens_used = None
-        if hasattr(api_message, 'usage'):
-            usage = api_message.usage
-            if usage:
-                tokens_used = getattr(usage, 'input_tokens', 0) + getattr(usage, 'output_tokens', 0)
-        elif hasattr(api_message, 'stop_reason'):
-            # For completions API, we can estimate tokens (rough: 1 token ≈ 4 chars)
-            # This is just an approximation
-            pass
-        
         metadata = Metadata(
             confidence_score=float(parsed.get("confidence_score", 0.5)),
             model_version=self.model,
@@ -174,7 +267,57 @@ class AIService:
         )
 
 
+def _tokens_used(api_message: Any) -> Optional[int]:
+    """Input (including prompt-cache writes and reads) + output tokens from the response object's usage, if reported."""
+    usage = getattr(api_message, 'usage', None)
+    if not usage:
+        return None
+    return (
+        (getattr(usage, 'input_tokens', 0) or 0)
+        + (getattr(usage, 'cache_creation_input_tokens', 0) or 0)
+        + (getattr(usage, 'cache_read_input_tokens', 0) or 0)
+        + (getattr(usage, 'output_tokens', 0) or 0)
+    )
+
+
+def _service_error(e: Exception) -> "AIServiceError":
+    """Wrap a provider/parse error; keep HTTP status and Retry-After so callers can decide on retries."""
+    status_code = None
+    retry_after = None
+    if isinstance(e, APIStatusError):
+        status_code = e.status_code
+        retry_after = _parse_retry_after(e.response.headers.get("retry-after"))
+    return AIServiceError(
+        f"Failed to analyze data: {str(e)}",
+        status_code=status_code,
+        retry_after=retry_after,
+    )
+
+
 class AIServiceError(Exception):
-    """Custom exception for AI service errors."""
-    pass
+    """
+    Custom exception for AI service errors.
+    status_code is the provider HTTP status (None for network/parse errors);
+    retry_after is the provider's Retry-After in seconds, when sent.
+    """
+
+    def __init__(
+        self,
+        message: str,
+        status_code: Optional[int] = None,
+        retry_after: Optional[float] = None,
+    ):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given in seconds; HTTP-date values are ignored."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
 
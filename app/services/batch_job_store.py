@@ -3,43 +3,134 @@ Batch job store: progress tracking and optional persistence.
 
 Enterprise rules:
 - Results are persisted when batch_persistence_backend=file or sqlite (not just in-memory).
+- File backend: one directory per job with meta.json (status/counters) and an append-only
+  results.jsonl, so each result costs one appended line instead of a full-state rewrite.
+  An append-only index.jsonl gets a line per job status change so list_jobs reads one file;
+  it is compacted to one line per job as it grows.
 - Cost tracking: total_tokens_used (and optional estimated_cost) per batch.
 - Partial results: clients can retrieve results before batch completes.
 - SQLite backend: results stored in tables (batch_jobs, batch_results) for querying.
+- Live progress: subscribers get per-record and status events pushed (used by the SSE endpoint).
+- Results are held column-wise with each response kept as its JSON bytes, so progress polls
+  and persistence never rebuild per-record Pydantic models.
 """
-import json
+import asyncio
+import os
 import sqlite3
 import uuid
+from array import array
+from collections import OrderedDict
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, Iterator, List, Optional, Any, Tuple
 import threading
 
+import orjson
+
 from app.config import settings
+from app.services.serialization import dumps, loads
 from app.models.schemas import (
     BatchJobStatus,
-    BatchRecordResult,
     AnalyzeResponse,
 )
 
 
-def _serialize_result(r: BatchRecordResult) -> Dict[str, Any]:
-    return {
-        "index": r.index,
-        "success": r.success,
-        "response": r.response.model_dump() if r.response else None,
-        "error": r.error,
-    }
+# SQL statements are module constants so the long-lived connection's statement cache reuses
+# the prepared form instead of re-parsing on every write.
+_SQL_UPSERT_JOB = """INSERT OR REPLACE INTO batch_jobs
+    (job_id, status, total_records, completed_count, failed_count, total_tokens_used, created_at, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)"""
+_SQL_UPDATE_JOB_COUNTS = """UPDATE batch_jobs
+    SET completed_count = ?, failed_count = ?, total_tokens_used = ?, updated_at = ?
+    WHERE job_id = ?"""
+_SQL_DELETE_RESULTS = "DELETE FROM batch_results WHERE job_id = ?"
+_SQL_INSERT_RESULT = """INSERT INTO batch_results (job_id, record_index, success, response_json, error)
+    VALUES (?, ?, ?, ?, ?)"""
+_SQL_SELECT_JOB = """SELECT job_id, status, total_records, completed_count, failed_count,
+    total_tokens_used, created_at, updated_at FROM batch_jobs WHERE job_id = ?"""
+_SQL_SELECT_RESULTS = """SELECT record_index, success, response_json, error
+    FROM batch_results WHERE job_id = ? ORDER BY record_index"""
+_SQL_LIST_JOBS = """SELECT job_id, status, total_records, completed_count, failed_count,
+    total_tokens_used, created_at, updated_at
+    FROM batch_jobs ORDER BY created_at DESC LIMIT ?"""
+# Per-job mutations lock one of this many stripes (by job_id hash) instead of one global lock
+_JOB_LOCK_STRIPES = 64
+# Refresh query-planner statistics (PRAGMA optimize) after this many write transactions
+_SQLITE_OPTIMIZE_EVERY_COMMITS = 1000
+# index.jsonl is compacted to one line per job once it is this large and has doubled since
+# the last compaction (so compaction costs amortized O(1) per appended line)
+_INDEX_COMPACT_MIN_BYTES = 1 << 20
+
+
+class _ResultColumns:
+    """
+    Per-job record results stored column-wise (struct of arrays) instead of a list of
+    BatchRecordResult models. Responses are kept as their JSON bytes and only decoded
+    when results are actually returned to a client.
+    """
+
+    __slots__ = ("indices", "successes", "responses", "errors")
+
+    def __init__(self) -> None:
+        self.indices = array("i")
+        self.successes = bytearray()
+        self.responses: List[Optional[bytes]] = []
+        self.errors: List[Optional[str]] = []
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def append(self, index: int, success: bool, response_json: Optional[bytes], error: Optional[str]) -> None:
+        self.indices.append(index)
+        self.successes.append(1 if success else 0)
+        self.responses.append(response_json)
+        self.errors.append(error)
+
+    def row(self, i: int) -> Dict[str, Any]:
+        """JSON-ready dict for result i; the response is embedded as-is without re-encoding."""
+        blob = self.responses[i]
+        return {
+            "index": self.indices[i],
+            "success": bool(self.successes[i]),
+            "response": orjson.Fragment(blob) if blob is not None else None,
+            "error": self.errors[i],
+        }
 
+    def rows(self) -> List[Dict[str, Any]]:
+        return [self.row(i) for i in range(len(self))]
 
-def _deserialize_result(d: Dict[str, Any]) -> BatchRecordResult:
-    resp = d.get("response")
-    return BatchRecordResult(
-        index=d["index"],
-        success=d["success"],
-        response=AnalyzeResponse(**resp) if resp else None,
-        error=d.get("error"),
-    )
+    def decoded(self) -> List[Dict[str, Any]]:
+        """BatchRecordResult-compatible dicts with responses decoded (for API responses)."""
+        return [
+            {
+                "index": self.indices[i],
+                "success": bool(self.successes[i]),
+                "response": orjson.loads(blob) if blob is not None else None,
+                "error": self.errors[i],
+            }
+            for i, blob in enumerate(self.responses)
+        ]
+
+    @classmethod
+    def from_dicts(cls, items: List[Dict[str, Any]]) -> "_ResultColumns":
+        """Rebuild from persisted result dicts (response as a decoded dict or None)."""
+        columns = cls()
+        for d in items:
+            resp = d.get("response")
+            columns.append(
+                d.get("index", 0),
+                bool(d.get("success")),
+                orjson.dumps(resp) if resp else None,
+                d.get("error"),
+            )
+        return columns
+
+
+def _encode_response(response: Optional[AnalyzeResponse]) -> Optional[bytes]:
+    """JSON bytes for an AnalyzeResponse (or None)."""
+    if response is None:
+        return None
+    return response.model_dump_json().encode()
 
 
 def _serialize_datetime(dt: datetime) -> str:
@@ -52,6 +143,47 @@ def _deserialize_datetime(s: Optional[str]) -> Optional[datetime]:
     return datetime.fromisoformat(s.replace("Z", "+00:00"))
 
 
+def _write_atomic(path: Path, data: bytes) -> None:
+    """
+    Replace path with data so readers (and a restart after a crash) see the old or the new
+    content, never a partial write. The temp name is per thread so concurrent writers of
+    the same file don't share it.
+    """
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def _parse_index(data: bytes) -> Dict[str, Dict[str, Any]]:
+    """Latest entry per job_id from index.jsonl content (later lines win)."""
+    entries: Dict[str, Dict[str, Any]] = {}
+    for line in data.splitlines():
+        try:
+            entry = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            continue  # torn last line after a crash
+        entries[entry["job_id"]] = entry
+    return entries
+
+
+def _serialize_state(job_id: str, job: Dict[str, Any], include_results: bool = True) -> Dict[str, Any]:
+    """Plain JSON-ready dict for a job (shared by the file and SQLite backends)."""
+    state = {
+        "job_id": job_id,
+        "status": job["status"].value if hasattr(job["status"], "value") else str(job["status"]),
+        "total_records": job["total_records"],
+        "completed_count": job["completed_count"],
+        "failed_count": job["failed_count"],
+        "total_tokens_used": job.get("total_tokens_used", 0),
+        # created_at never changes, so its ISO string is formatted once and kept on the job
+        "created_at": job.get("created_at_iso") or _serialize_datetime(job["created_at"]),
+        "updated_at": _serialize_datetime(job["updated_at"]),
+    }
+    if include_results:
+        state["results"] = job["results"].rows()
+    return state
+
+
 class BatchJobStore:
     """
     Store batch job state with optional file or SQLite persistence.
@@ -63,17 +195,97 @@ class BatchJobStore:
 
     def __init__(self):
         self._jobs: Dict[str, Dict[str, Any]] = {}
+        # Finished jobs held in _jobs, least recently used first (guarded by _lock). With a
+        # durable backend only the newest batch_max_cached_finished_jobs stay in memory, so
+        # completed results don't accumulate for the life of the process.
+        self._finished: "OrderedDict[str, None]" = OrderedDict()
+        self._max_cached_finished = max(0, getattr(settings, "batch_max_cached_finished_jobs", 128))
+        # _lock guards the _jobs, _finished and _subscribers dicts; a job's fields are mutated under
+        # its striped lock (_job_lock) so appends to different jobs don't contend.
         self._lock = threading.Lock()
+        self._job_locks = [threading.Lock() for _ in range(_JOB_LOCK_STRIPES)]
         self._backend = getattr(settings, "batch_persistence_backend", "memory") or "memory"
         self._storage_path = Path(getattr(settings, "batch_job_storage_path", "data/batch_jobs"))
         self._sqlite_path = getattr(settings, "batch_sqlite_path", "data/batch.db")
+        # One long-lived SQLite connection shared across threads; _sqlite_lock serializes access.
+        self._sqlite_conn: Optional[sqlite3.Connection] = None
+        self._sqlite_lock = threading.Lock()
+        # How many of each job's results are already in batch_results (guarded by _sqlite_lock),
+        # so every write inserts only the new rows.
+        self._persisted_counts: Dict[str, int] = {}
+        self._sqlite_commits = 0
+        # File backend: serializes index.jsonl appends, rebuilds and compactions
+        self._index_lock = threading.Lock()
+        # index.jsonl size right after it was last rebuilt or compacted (guarded by _index_lock)
+        self._index_compacted_size = 0
+        # Per-job event queues for live progress streaming (fed from the event loop)
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+        if self._backend == "sqlite":
+            # Open (and create tables) at startup so the first request doesn't pay for it
+            # and a bad BATCH_SQLITE_PATH fails fast.
+            with self._sqlite_lock:
+                self._get_sqlite_conn()
+
+    def _job_lock(self, job_id: str) -> threading.Lock:
+        """Lock stripe guarding job_id's counters, status and results."""
+        return self._job_locks[hash(job_id) % _JOB_LOCK_STRIPES]
+
+    def _retain_finished(self, job_id: str) -> None:
+        """
+        Mark job_id as the most recently used finished job and evict the least recently used
+        ones beyond the cap. Memory backend: no-op, since memory is the only copy.
+        """
+        if self._backend == "memory":
+            return
+        evicted = []
+        with self._lock:
+            if job_id not in self._jobs:
+                return
+            self._finished[job_id] = None
+            self._finished.move_to_end(job_id)
+            while len(self._finished) > self._max_cached_finished:
+                old_id, _ = self._finished.popitem(last=False)
+                self._jobs.pop(old_id, None)
+                evicted.append(old_id)
+        if evicted and self._backend == "sqlite":
+            with self._sqlite_lock:
+                for old_id in evicted:
+                    self._persisted_counts.pop(old_id, None)
 
     def _get_sqlite_conn(self) -> sqlite3.Connection:
+        """Return the shared connection, opening it on first use. Caller must hold _sqlite_lock."""
+        if self._sqlite_conn is not None:
+            return self._sqlite_conn
         Path(self._sqlite_path).parent.mkdir(parents=True, exist_ok=True)
-        conn = sqlite3.connect(self._sqlite_path)
+        conn = sqlite3.connect(self._sqlite_path, check_same_thread=False)
         conn.row_factory = sqlite3.Row
+        # WAL: readers don't block the writer; NORMAL sync is durable across app crashes in WAL mode.
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        # Wait up to 5 s for another process's write lock instead of failing with "database is locked"
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-20000")  # ~20 MB page cache
+        conn.execute("PRAGMA mmap_size=268435456")
+        self._init_sqlite(conn)
+        self._sqlite_conn = conn
         return conn
 
+    def _commit(self, conn: sqlite3.Connection) -> None:
+        """
+        Commit a write transaction and, every _SQLITE_OPTIMIZE_EVERY_COMMITS commits, run
+        PRAGMA optimize so planner statistics keep up as jobs accumulate. Caller must hold _sqlite_lock.
+        """
+        conn.commit()
+        self._sqlite_commits += 1
+        if self._sqlite_commits % _SQLITE_OPTIMIZE_EVERY_COMMITS == 0:
+            conn.execute("PRAGMA optimize")
+
+    def ping(self) -> None:
+        """Readiness check for the sqlite backend: run a trivial query on the shared connection."""
+        with self._sqlite_lock:
+            self._get_sqlite_conn().execute("SELECT 1")
+
     def _init_sqlite(self, conn: sqlite3.Connection) -> None:
         conn.executescript("""
             CREATE TABLE IF NOT EXISTS batch_jobs (
@@ -99,140 +311,251 @@ class BatchJobStore:
         """)
         conn.commit()
 
-    def _persist_sqlite(self, job_id: str) -> None:
+    def _persist_sqlite(self, job_id: str, state: Dict[str, Any], results: "_ResultColumns") -> None:
         """Persist job to SQLite tables (batch_jobs + batch_results)."""
-        job = self._jobs.get(job_id)
-        if not job:
-            return
-        conn = self._get_sqlite_conn()
-        try:
-            self._init_sqlite(conn)
-            status_val = job["status"].value if hasattr(job["status"], "value") else str(job["status"])
-            created = _serialize_datetime(job["created_at"])
-            updated = _serialize_datetime(job["updated_at"])
+        with self._sqlite_lock:
+            conn = self._get_sqlite_conn()
             conn.execute(
-                """INSERT OR REPLACE INTO batch_jobs
-                   (job_id, status, total_records, completed_count, failed_count, total_tokens_used, created_at, updated_at)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                _SQL_UPSERT_JOB,
                 (
                     job_id,
-                    status_val,
-                    job["total_records"],
-                    job["completed_count"],
-                    job["failed_count"],
-                    job.get("total_tokens_used", 0),
-                    created,
-                    updated,
+                    state["status"],
+                    state["total_records"],
+                    state["completed_count"],
+                    state["failed_count"],
+                    state["total_tokens_used"],
+                    state["created_at"],
+                    state["updated_at"],
                 ),
             )
-            conn.execute("DELETE FROM batch_results WHERE job_id = ?", (job_id,))
-            for r in job["results"]:
-                resp_json = json.dumps(r.response.model_dump()) if r.response else None
-                conn.execute(
-                    """INSERT INTO batch_results (job_id, record_index, success, response_json, error)
-                       VALUES (?, ?, ?, ?, ?)""",
-                    (job_id, r.index, 1 if r.success else 0, resp_json, r.error),
-                )
-            conn.commit()
-        finally:
-            conn.close()
-
-    def _persist(self, job_id: str) -> None:
-        """Persist job to file or SQLite according to backend. No-op for memory."""
-        if self._backend == "sqlite":
-            self._persist_sqlite(job_id)
-            return
-        if self._backend != "file":
+            persisted = self._insert_new_results(conn, job_id, results)
+            self._commit(conn)
+            self._persisted_counts[job_id] = persisted
+
+    def _insert_new_results(self, conn: sqlite3.Connection, job_id: str, results: "_ResultColumns") -> int:
+        """
+        Insert the results not yet written for job_id and return the new persisted count
+        (record it only after commit). A job with no known count has its rows rebuilt
+        from scratch. Caller must hold _sqlite_lock.
+        """
+        start = self._persisted_counts.get(job_id)
+        with self._job_lock(job_id):  # appends happen under it; never take _sqlite_lock while holding it
+            end = len(results)
+        if start is None:
+            conn.execute(_SQL_DELETE_RESULTS, (job_id,))
+            start = 0
+        if end > start:
+            conn.executemany(
+                _SQL_INSERT_RESULT,
+                (
+                    (job_id, index, success, blob.decode() if blob is not None else None, error)
+                    for index, success, blob, error in zip(
+                        results.indices[start:end],
+                        results.successes[start:end],
+                        results.responses[start:end],
+                        results.errors[start:end],
+                    )
+                ),
+            )
+        return end
+
+    def _persist_sqlite_append(self, job_id: str, state: Dict[str, Any], results: "_ResultColumns") -> None:
+        """Persist newly appended results: insert their rows and update the job counters in one transaction."""
+        with self._sqlite_lock:
+            conn = self._get_sqlite_conn()
+            persisted = self._insert_new_results(conn, job_id, results)
+            conn.execute(
+                _SQL_UPDATE_JOB_COUNTS,
+                (
+                    state["completed_count"],
+                    state["failed_count"],
+                    state["total_tokens_used"],
+                    state["updated_at"],
+                    job_id,
+                ),
+            )
+            self._commit(conn)
+            self._persisted_counts[job_id] = persisted
+
+    def _snapshot(self, job_id: str, job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Persistence payload for job (status and counters, no results). Mutators take it
+        while holding the job's striped lock (_job_lock) and hand it to _persist, so
+        persistence I/O runs after the lock is released and never reads the live job dict.
+        None for the memory backend.
+        """
+        if self._backend not in ("file", "sqlite"):
+            return None
+        return _serialize_state(job_id, job, include_results=False)
+
+    def _persist(
+        self,
+        job_id: str,
+        state: Optional[Dict[str, Any]],
+        results: "_ResultColumns",
+        appended: Optional[int] = None,
+    ) -> None:
+        """
+        Persist a job snapshot (from _snapshot) to file or SQLite according to backend.
+        No-op for memory. results is the job's append-only result store; rows already in
+        it never change. Pass appended (position of a newly added result) to write just
+        that result incrementally instead of the whole job. SQLite only ever inserts
+        result rows not yet written, so status changes no longer rewrite the results table.
+        """
+        if state is None:
             return
-        job = self._jobs.get(job_id)
-        if not job:
+        if self._backend == "sqlite":
+            if appended is not None:
+                self._persist_sqlite_append(job_id, state, results)
+            else:
+                self._persist_sqlite(job_id, state, results)
             return
+        job_dir = self._storage_path / job_id
+        job_dir.mkdir(parents=True, exist_ok=True)
+        if appended is not None:
+            # Single O_APPEND write per line so concurrent appends never interleave.
+            line = orjson.dumps(results.row(appended)) + b"\n"
+            fd = os.open(job_dir / "results.jsonl", os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+        _write_atomic(job_dir / "meta.json", orjson.dumps(state))
+        if appended is None:
+            self._append_index(state)
+
+    def _append_index(self, state: Dict[str, Any]) -> None:
+        """File backend: record a job status change as one line in index.jsonl (last line per job wins)."""
+        index_path = self._storage_path / "index.jsonl"
+        with self._index_lock:
+            if not index_path.exists():
+                # Build from existing jobs first so the index never misses older ones
+                self._rebuild_index()
+            fd = os.open(index_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                os.write(fd, orjson.dumps(state) + b"\n")
+                size = os.fstat(fd).st_size
+            finally:
+                os.close(fd)
+            if size >= max(_INDEX_COMPACT_MIN_BYTES, 2 * self._index_compacted_size):
+                self._compact_index()
+
+    def _compact_index(self) -> None:
+        """
+        Rewrite index.jsonl with only the latest line per job, so it stops growing with every
+        status change and list_jobs reads one line per job. Caller must hold _index_lock.
+        """
+        index_path = self._storage_path / "index.jsonl"
+        entries = _parse_index(index_path.read_bytes())
+        data = b"".join(orjson.dumps(entry) + b"\n" for entry in entries.values())
+        _write_atomic(index_path, data)
+        self._index_compacted_size = len(data)
+
+    def _rebuild_index(self) -> None:
+        """
+        Write index.jsonl from every job's meta.json (plus legacy {job_id}.json files).
+        Used once for storage that predates the index. Caller must hold _index_lock.
+        """
         self._storage_path.mkdir(parents=True, exist_ok=True)
-        path = self._storage_path / f"{job_id}.json"
-        payload = {
-            "job_id": job_id,
-            "status": job["status"].value if hasattr(job["status"], "value") else str(job["status"]),
-            "total_records": job["total_records"],
-            "completed_count": job["completed_count"],
-            "failed_count": job["failed_count"],
-            "total_tokens_used": job.get("total_tokens_used", 0),
-            "results": [_serialize_result(r) for r in job["results"]],
-            "created_at": _serialize_datetime(job["created_at"]),
-            "updated_at": _serialize_datetime(job["updated_at"]),
-        }
-        with open(path, "w") as f:
-            json.dump(payload, f, indent=2)
+        paths = [(p.parent.name, p) for p in self._storage_path.glob("*/meta.json")]
+        paths += [(p.stem, p) for p in self._storage_path.glob("*.json")]
+        lines = []
+        for job_id, path in paths:
+            try:
+                data = orjson.loads(path.read_bytes())
+            except (orjson.JSONDecodeError, OSError):
+                continue
+            data.pop("results", None)
+            data["job_id"] = job_id
+            lines.append(orjson.dumps(data) + b"\n")
+        content = b"".join(lines)
+        _write_atomic(self._storage_path / "index.jsonl", content)
+        self._index_compacted_size = len(content)
+
+    def _read_index(self) -> Dict[str, Dict[str, Any]]:
+        """File backend: latest indexed state per job_id from index.jsonl (built on first use)."""
+        index_path = self._storage_path / "index.jsonl"
+        with self._index_lock:
+            if not index_path.exists():
+                self._rebuild_index()
+            data = index_path.read_bytes()
+        return _parse_index(data)
 
     def _load_from_sqlite(self, job_id: str) -> Optional[Dict[str, Any]]:
         """Load job from SQLite tables. Used when job not in memory (e.g. after restart)."""
         if self._backend != "sqlite":
             return None
-        conn = self._get_sqlite_conn()
-        try:
-            self._init_sqlite(conn)
-            row = conn.execute(
-                "SELECT job_id, status, total_records, completed_count, failed_count, total_tokens_used, created_at, updated_at FROM batch_jobs WHERE job_id = ?",
-                (job_id,),
-            ).fetchone()
+        with self._sqlite_lock:
+            conn = self._get_sqlite_conn()
+            row = conn.execute(_SQL_SELECT_JOB, (job_id,)).fetchone()
             if not row:
                 return None
-            status_val = row["status"]
-            try:
-                status = BatchJobStatus(status_val)
-            except ValueError:
-                status = BatchJobStatus.COMPLETED
-            results = []
-            for r in conn.execute(
-                "SELECT record_index, success, response_json, error FROM batch_results WHERE job_id = ? ORDER BY record_index",
-                (job_id,),
-            ):
-                success = bool(r["success"])
-                resp = None
-                if success and r["response_json"]:
-                    try:
-                        resp = AnalyzeResponse(**json.loads(r["response_json"]))
-                    except Exception:
-                        pass
-                results.append(
-                    BatchRecordResult(
-                        index=r["record_index"],
-                        success=success,
-                        response=resp,
-                        error=r["error"],
-                    )
+            result_rows = conn.execute(_SQL_SELECT_RESULTS, (job_id,)).fetchall()
+            self._persisted_counts[job_id] = len(result_rows)
+        status_val = row["status"]
+        try:
+            status = BatchJobStatus(status_val)
+        except ValueError:
+            status = BatchJobStatus.COMPLETED
+        results = _ResultColumns()
+        for r in result_rows:
+            success = bool(r["success"])
+            resp_json = r["response_json"]
+            results.append(
+                r["record_index"],
+                success,
+                resp_json.encode() if success and resp_json else None,
+                r["error"],
             )
-            return {
-                "job_id": job_id,
-                "status": status,
-                "total_records": row["total_records"],
-                "completed_count": row["completed_count"],
-                "failed_count": row["failed_count"],
-                "total_tokens_used": row["total_tokens_used"] or 0,
-                "results": results,
-                "created_at": _deserialize_datetime(row["created_at"]),
-                "updated_at": _deserialize_datetime(row["updated_at"]),
-            }
-        finally:
-            conn.close()
+        return {
+            "job_id": job_id,
+            "status": status,
+            "total_records": row["total_records"],
+            "completed_count": row["completed_count"],
+            "failed_count": row["failed_count"],
+            "total_tokens_used": row["total_tokens_used"] or 0,
+            "results": results,
+            "created_at": _deserialize_datetime(row["created_at"]),
+            "created_at_iso": row["created_at"],
+            "updated_at": _deserialize_datetime(row["updated_at"]),
+        }
+
+    def _read_file_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Read raw job data from {job_id}/meta.json + results.jsonl, falling back to a
+        legacy single {job_id}.json file. Returns None if missing or unreadable.
+        """
+        job_dir = self._storage_path / job_id
+        meta_path = job_dir / "meta.json"
+        try:
+            if not meta_path.exists():
+                legacy = self._storage_path / f"{job_id}.json"
+                if not legacy.exists():
+                    return None
+                return orjson.loads(legacy.read_bytes())
+            data = orjson.loads(meta_path.read_bytes())
+            results_path = job_dir / "results.jsonl"
+            data["results"] = []
+            if results_path.exists():
+                with open(results_path, "rb") as f:
+                    for line in f:
+                        try:
+                            data["results"].append(orjson.loads(line))
+                        except orjson.JSONDecodeError:
+                            # Torn final line from a crash mid-write; earlier lines are intact.
+                            continue
+            return data
+        except (orjson.JSONDecodeError, OSError):
+            return None
 
     def _load_from_file(self, job_id: str) -> Optional[Dict[str, Any]]:
         """Load job from file if it exists. Used when job not in memory (e.g. after restart)."""
         if self._backend != "file":
             return None
-        path = self._storage_path / f"{job_id}.json"
-        if not path.exists():
+        data = self._read_file_job(job_id)
+        if data is None:
             return None
-        try:
-            with open(path) as f:
-                data = json.load(f)
-        except (json.JSONDecodeError, OSError):
-            return None
-        results = []
-        for r in data.get("results", []):
-            try:
-                results.append(_deserialize_result(r))
-            except Exception:
-                results.append(BatchRecordResult(index=r.get("index", 0), success=False, error=r.get("error", "Parse error")))
+        results = _ResultColumns.from_dicts(data.get("results", []))
         status_val = data.get("status", "completed")
         try:
             status = BatchJobStatus(status_val)
@@ -247,48 +570,132 @@ class BatchJobStore:
             "total_tokens_used": data.get("total_tokens_used", 0),
             "results": results,
             "created_at": _deserialize_datetime(data.get("created_at")),
+            "created_at_iso": data.get("created_at"),
             "updated_at": _deserialize_datetime(data.get("updated_at")),
         }
 
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        """Register a queue that receives progress events for job_id. Pair with unsubscribe()."""
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers.setdefault(job_id, []).append(queue)
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue) -> None:
+        """Remove a queue registered with subscribe()."""
+        with self._lock:
+            subs = self._subscribers.get(job_id)
+            if subs and queue in subs:
+                subs.remove(queue)
+                if not subs:
+                    del self._subscribers[job_id]
+
+    def _publish(self, job_id: str, build_event: Callable[[], Dict[str, Any]]) -> None:
+        """Push an event to subscribers of job_id. The event is only built if someone is listening."""
+        with self._lock:
+            subs = list(self._subscribers.get(job_id, ()))
+        if not subs:
+            return
+        event = build_event()
+        for queue in subs:
+            queue.put_nowait(event)
+
+    def status_event(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Current status and counters for job_id as a progress event, or None if not found."""
+        job = self.get_job(job_id)
+        if not job:
+            return None
+        return {
+            "event": "status",
+            "status": job["status"].value if hasattr(job["status"], "value") else str(job["status"]),
+            "total_records": job["total_records"],
+            "completed_count": job["completed_count"],
+            "failed_count": job["failed_count"],
+        }
+
+    def persist_pending_records(self, job_id: str, items: List[Tuple[Optional[dict], List[str]]]) -> bool:
+        """
+        File backend: write a job's unprocessed records to {job_id}/pending.jsonl so the
+        processor can stream them instead of holding the batch in memory. Returns False
+        (nothing written) for other backends.
+        """
+        if self._backend != "file":
+            return False
+        job_dir = self._storage_path / job_id
+        job_dir.mkdir(parents=True, exist_ok=True)
+        with open(job_dir / "pending.jsonl", "wb", buffering=64 * 1024) as f:
+            for structured_data, notes in items:
+                # dumps/loads keep integers wider than 64 bits exact (orjson alone can't)
+                f.write(dumps([structured_data, notes]))
+                f.write(b"\n")
+        return True
+
+    def iter_pending_records(self, job_id: str) -> Iterator[Tuple[Optional[dict], List[str]]]:
+        """Yield (structured_data, notes) from {job_id}/pending.jsonl one line at a time."""
+        with open(self._storage_path / job_id / "pending.jsonl", "rb") as f:
+            for line in f:
+                structured_data, notes = loads(line)
+                yield structured_data, notes
+
+    def discard_pending_records(self, job_id: str) -> None:
+        """Remove {job_id}/pending.jsonl once the job no longer needs it (no-op if absent)."""
+        if self._backend != "file":
+            return
+        try:
+            (self._storage_path / job_id / "pending.jsonl").unlink()
+        except FileNotFoundError:
+            pass
+
     def create_job(self, total_records: int) -> str:
         """Create a new batch job and return its job_id."""
         job_id = str(uuid.uuid4())
         now = datetime.now(timezone.utc)
+        job = {
+            "job_id": job_id,
+            "status": BatchJobStatus.ACCEPTED,
+            "total_records": total_records,
+            "completed_count": 0,
+            "failed_count": 0,
+            "total_tokens_used": 0,
+            "results": _ResultColumns(),
+            "created_at": now,
+            "created_at_iso": now.isoformat(),
+            "updated_at": now,
+        }
+        state = self._snapshot(job_id, job)
         with self._lock:
-            self._jobs[job_id] = {
-                "job_id": job_id,
-                "status": BatchJobStatus.ACCEPTED,
-                "total_records": total_records,
-                "completed_count": 0,
-                "failed_count": 0,
-                "total_tokens_used": 0,
-                "results": [],
-                "created_at": now,
-                "updated_at": now,
-            }
-        self._persist(job_id)
+            self._jobs[job_id] = job
+        self._persist(job_id, state, job["results"])
         return job_id
 
     def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
         """Get job state by job_id. For file/sqlite backend, loads from storage if not in memory."""
         with self._lock:
-            if job_id in self._jobs:
-                return self._jobs[job_id]
+            job = self._jobs.get(job_id)
+            if job is not None:
+                if job_id in self._finished:
+                    self._finished.move_to_end(job_id)
+                return job
         loaded = self._load_from_sqlite(job_id) if self._backend == "sqlite" else self._load_from_file(job_id)
         if loaded:
             with self._lock:
                 self._jobs[job_id] = loaded
+            if loaded["status"] in (BatchJobStatus.COMPLETED, BatchJobStatus.FAILED):
+                self._retain_finished(job_id)
             return loaded
         return None
 
     def set_processing(self, job_id: str) -> bool:
         """Mark job as processing. Returns False if job not found."""
-        with self._lock:
-            if job_id not in self._jobs:
-                return False
-            self._jobs[job_id]["status"] = BatchJobStatus.PROCESSING
-            self._jobs[job_id]["updated_at"] = datetime.now(timezone.utc)
-        self._persist(job_id)
+        job = self._jobs.get(job_id)
+        if job is None:
+            return False
+        with self._job_lock(job_id):
+            job["status"] = BatchJobStatus.PROCESSING
+            job["updated_at"] = datetime.now(timezone.utc)
+            state = self._snapshot(job_id, job)
+        self._persist(job_id, state, job["results"])
+        self._publish(job_id, lambda: self.status_event(job_id))
         return True
 
     def append_result(
@@ -301,18 +708,11 @@ class BatchJobStore:
         tokens_used: Optional[int] = None,
     ) -> bool:
         """Append a single record result and update counts. Optional tokens_used for cost tracking."""
-        with self._lock:
-            if job_id not in self._jobs:
-                return False
-            job = self._jobs[job_id]
-            job["results"].append(
-                BatchRecordResult(
-                    index=index,
-                    success=success,
-                    response=response,
-                    error=error,
-                )
-            )
+        job = self._jobs.get(job_id)
+        if job is None:
+            return False
+        with self._job_lock(job_id):
+            job["results"].append(index, success, _encode_response(response), error)
             if success:
                 job["completed_count"] += 1
                 if tokens_used is not None:
@@ -320,33 +720,57 @@ class BatchJobStore:
             else:
                 job["failed_count"] += 1
             job["updated_at"] = datetime.now(timezone.utc)
-        self._persist(job_id)
+            pos = len(job["results"]) - 1
+            completed, failed = job["completed_count"], job["failed_count"]
+            state = self._snapshot(job_id, job)
+        self._persist(job_id, state, job["results"], appended=pos)
+        self._publish(job_id, lambda: {
+            "event": "result",
+            "total_records": job["total_records"],
+            "completed_count": completed,
+            "failed_count": failed,
+            "result": job["results"].row(pos),
+        })
         return True
 
     def set_job_completed(self, job_id: str) -> bool:
         """Mark job as completed. Returns False if job not found."""
-        with self._lock:
-            if job_id not in self._jobs:
-                return False
-            self._jobs[job_id]["status"] = BatchJobStatus.COMPLETED
-            self._jobs[job_id]["updated_at"] = datetime.now(timezone.utc)
-        self._persist(job_id)
+        job = self._jobs.get(job_id)
+        if job is None:
+            return False
+        with self._job_lock(job_id):
+            job["status"] = BatchJobStatus.COMPLETED
+            job["updated_at"] = datetime.now(timezone.utc)
+            state = self._snapshot(job_id, job)
+        self._persist(job_id, state, job["results"])
+        self._publish(job_id, lambda: self.status_event(job_id))
+        self._retain_finished(job_id)
         return True
 
     def set_job_failed(self, job_id: str, message: Optional[str] = None) -> bool:
         """Mark job as failed (e.g. fatal error). Returns False if job not found."""
-        with self._lock:
-            if job_id not in self._jobs:
-                return False
-            self._jobs[job_id]["status"] = BatchJobStatus.FAILED
-            self._jobs[job_id]["updated_at"] = datetime.now(timezone.utc)
+        job = self._jobs.get(job_id)
+        if job is None:
+            return False
+        with self._job_lock(job_id):
+            job["status"] = BatchJobStatus.FAILED
+            job["updated_at"] = datetime.now(timezone.utc)
             if message:
-                self._jobs[job_id]["failure_message"] = message
-        self._persist(job_id)
+                job["failure_message"] = message
+            state = self._snapshot(job_id, job)
+        self._persist(job_id, state, job["results"])
+        self._publish(job_id, lambda: self.status_event(job_id))
+        self._retain_finished(job_id)
         return True
 
-    def get_status_response(self, job_id: str) -> Optional[Dict[str, Any]]:
-        """Build BatchStatusResponse-compatible dict (includes partial results and cost tracking)."""
+    def get_status_response(
+        self, job_id: str, include_results: bool = True, encoded_results: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Build BatchStatusResponse-compatible dict (includes partial results and cost tracking).
+        With include_results=False only counters are returned and no stored response is decoded.
+        With encoded_results=True responses stay as orjson.Fragment (for orjson.dumps, not models).
+        """
         job = self.get_job(job_id)
         if not job:
             return None
@@ -377,7 +801,10 @@ class BatchJobStore:
             "progress_percent": round(progress, 2),
             "total_tokens_used": total_tokens,
             "estimated_cost": estimated_cost,
-            "results": job["results"] if job["results"] else None,
+            "results": (
+                (job["results"].rows() if encoded_results else job["results"].decoded())
+                if include_results and job["results"] else None
+            ),
             "created_at": job["created_at"],
             "updated_at": job["updated_at"],
         }
@@ -389,53 +816,42 @@ class BatchJobStore:
         total_tokens_used, created_at, updated_at.
         """
         if self._backend == "sqlite":
-            conn = self._get_sqlite_conn()
-            try:
-                self._init_sqlite(conn)
-                rows = conn.execute(
-                    """SELECT job_id, status, total_records, completed_count, failed_count,
-                              total_tokens_used, created_at, updated_at
-                       FROM batch_jobs ORDER BY created_at DESC LIMIT ?""",
-                    (limit,),
-                ).fetchall()
-                return [
-                    {
-                        "job_id": r["job_id"],
-                        "status": r["status"],
-                        "total_records": r["total_records"],
-                        "completed_count": r["completed_count"],
-                        "failed_count": r["failed_count"],
-                        "total_tokens_used": r["total_tokens_used"] or 0,
-                        "created_at": r["created_at"],
-                        "updated_at": r["updated_at"],
-                    }
-                    for r in rows
-                ]
-            finally:
-                conn.close()
+            with self._sqlite_lock:
+                rows = self._get_sqlite_conn().execute(_SQL_LIST_JOBS, (limit,)).fetchall()
+            return [
+                {
+                    "job_id": r["job_id"],
+                    "status": r["status"],
+                    "total_records": r["total_records"],
+                    "completed_count": r["completed_count"],
+                    "failed_count": r["failed_count"],
+                    "total_tokens_used": r["total_tokens_used"] or 0,
+                    "created_at": r["created_at"],
+                    "updated_at": r["updated_at"],
+                }
+                for r in rows
+            ]
         if self._backend == "file":
-            self._storage_path.mkdir(parents=True, exist_ok=True)
-            jobs = []
-            for path in sorted(self._storage_path.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True):
-                job_id = path.stem
-                try:
-                    with open(path) as f:
-                        data = json.load(f)
-                    jobs.append({
-                        "job_id": job_id,
-                        "status": data.get("status", "completed"),
-                        "total_records": data.get("total_records", 0),
-                        "completed_count": data.get("completed_count", 0),
-                        "failed_count": data.get("failed_count", 0),
-                        "total_tokens_used": data.get("total_tokens_used", 0),
-                        "created_at": data.get("created_at"),
-                        "updated_at": data.get("updated_at"),
-                    })
-                except (json.JSONDecodeError, OSError):
-                    continue
-                if len(jobs) >= limit:
-                    break
-            return jobs
+            # One read of index.jsonl instead of glob + stat + open per job; jobs held in
+            # memory override their index entry with live counters.
+            entries = self._read_index()
+            with self._lock:
+                for job_id, job in self._jobs.items():
+                    entries[job_id] = _serialize_state(job_id, job, include_results=False)
+            latest = sorted(entries.values(), key=lambda d: d.get("created_at") or "", reverse=True)
+            return [
+                {
+                    "job_id": data["job_id"],
+                    "status": data.get("status", "completed"),
+                    "total_records": data.get("total_records", 0),
+                    "completed_count": data.get("completed_count", 0),
+                    "failed_count": data.get("failed_count", 0),
+                    "total_tokens_used": data.get("total_tokens_used", 0),
+                    "created_at": data.get("created_at"),
+                    "updated_at": data.get("updated_at"),
+                }
+                for data in latest[:limit]
+            ]
         # memory: from _jobs
         with self._lock:
             all_jobs = list(self._jobs.values())
@@ -1,60 +1,135 @@
 """Caching service for request deduplication and performance."""
-from typing import Optional, Any
-from cachetools import TTLCache
-import hashlib
-import json
+from typing import Optional
+from cachetools import LRUCache, TTLCache
+import orjson
+import xxhash
+import zstandard
 from app.config import settings
+from app.models.schemas import AnalyzeResponse
+from app.services.serialization import dumps
 
 
 class CacheService:
-    """Simple in-memory cache with TTL for request deduplication."""
+    """
+    Simple in-memory cache with TTL for request deduplication.
+    Entries expire after CACHE_TTL_SECONDS; when the cache is full the least recently
+    used entry is evicted, so hot prompts stay cached under skewed traffic.
+    Responses are stored as zstd-compressed JSON, several times smaller than the model
+    objects, so the same memory holds more entries.
+    """
     
     def __init__(self):
         """Initialize cache with TTL from settings."""
-        self.cache: TTLCache[str, Any] = TTLCache(
-            maxsize=1000,
+        self.cache: TTLCache[bytes, bytes] = TTLCache(
+            maxsize=settings.cache_max_entries,
             ttl=settings.cache_ttl_seconds
         )
         self.enabled = settings.enable_cache
+        # Front tier for make_key: notes-only requests map straight to their digest.
+        # tuple(notes) hashes cheaply (str hashes are cached), so hot keys skip
+        # JSON serialization and hashing entirely.
+        self._key_memo: LRUCache[tuple, bytes] = LRUCache(maxsize=1024)
+        # Not safe for simultaneous use from several threads; the cache is only touched
+        # from the event loop.
+        self._compressor = zstandard.ZstdCompressor(level=3)
+        self._decompressor = zstandard.ZstdDecompressor()
     
-    def _generate_key(self, structured_data: Optional[dict], notes: list) -> str:
+    def make_key(self, structured_data: Optional[dict], notes: list) -> bytes:
         """
         Generate a cache key from request data.
-        Uses deterministic hashing for deduplication.
+        Uses deterministic hashing for deduplication. Callers that both get and set
+        the same request should compute the key once and pass it to both.
         """
-        # Normalize data for consistent hashing
-        cache_data = {
-            "structured_data": structured_data or {},
-            "notes": sorted(notes) if isinstance(notes, list) else [notes]
-        }
-        
-        # Create deterministic JSON string
-        cache_str = json.dumps(cache_data, sort_keys=True, ensure_ascii=False)
+        if not structured_data and isinstance(notes, list):
+            memo_key = tuple(notes)
+            key = self._key_memo.get(memo_key)
+            if key is None:
+                key = self._hash_request(structured_data, notes)
+                self._key_memo[memo_key] = key
+            return key
+        return self._hash_request(structured_data, notes)
+
+    @staticmethod
+    def _hash_request(structured_data: Optional[dict], notes: list) -> bytes:
+        """Hash the request to a 128-bit XXH3 digest (non-cryptographic; it is only a dict key)."""
+        # Stream parts into the hasher instead of serializing one combined document:
+        # canonical JSON (sorted keys) of the structured data, then each note (sorted so
+        # order doesn't matter) behind a length prefix so note boundaries are unambiguous.
+        # dumps falls back to the stdlib for integers orjson can't encode (wider than 64 bits).
+        hasher = xxhash.xxh3_128(dumps(structured_data or {}, option=orjson.OPT_SORT_KEYS))
+        for note in sorted(notes) if isinstance(notes, list) else [notes]:
+            encoded = note.encode()
+            hasher.update(len(encoded).to_bytes(8, "little"))
+            hasher.update(encoded)
+        return hasher.digest()
+    
+    def get(
+        self,
+        structured_data: Optional[dict],
+        notes: list,
+        key: Optional[bytes] = None,
+    ) -> Optional[AnalyzeResponse]:
+        """Retrieve cached response if available. Pass a precomputed key to skip hashing."""
+        if not self.enabled:
+            return None
         
-        # Hash for shorter key
-        return hashlib.sha256(cache_str.encode()).hexdigest()
+        if key is None:
+            key = self.make_key(structured_data, notes)
+        blob = self.get_json(structured_data, notes, key=key)
+        if blob is None:
+            return None
+        return AnalyzeResponse.model_validate_json(blob)
     
-    def get(self, structured_data: Optional[dict], notes: list) -> Optional[Any]:
-        """Retrieve cached response if available."""
+    def get_json(
+        self,
+        structured_data: Optional[dict],
+        notes: list,
+        key: Optional[bytes] = None,
+    ) -> Optional[bytes]:
+        """Cached response as its JSON bytes, for callers that send it on without a model."""
         if not self.enabled:
             return None
         
-        key = self._generate_key(structured_data, notes)
-        return self.cache.get(key)
+        if key is None:
+            key = self.make_key(structured_data, notes)
+        blob = self.cache.get(key)
+        if blob is None:
+            return None
+        return self._decompressor.decompress(blob)
+    
+    def set(
+        self,
+        structured_data: Optional[dict],
+        notes: list,
+        value: AnalyzeResponse,
+        key: Optional[bytes] = None,
+    ) -> None:
+        """Store response in cache. Pass a precomputed key to skip hashing."""
+        if not self.enabled:
+            return
+        
+        self.set_json(structured_data, notes, value.model_dump_json().encode(), key=key)
     
-    def set(self, structured_data: Optional[dict], notes: list, value: Any) -> None:
-        """Store response in cache."""
+    def set_json(
+        self,
+        structured_data: Optional[dict],
+        notes: list,
+        value_json: bytes,
+        key: Optional[bytes] = None,
+    ) -> None:
+        """Store a response already serialized with model_dump_json()."""
         if not self.enabled:
             return
         
-        key = self._generate_key(structured_data, notes)
-        self.cache[key] = value
+        if key is None:
+            key = self.make_key(structured_data, notes)
+        self.cache[key] = self._compressor.compress(value_json)
     
     def clear(self) -> None:
         """Clear all cached entries."""
         self.cache.clear()
+        self._key_memo.clear()
 
 
 # Global cache instance
 cache_service = CacheService()
-
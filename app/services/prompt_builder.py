@@ -1,6 +1,103 @@
 """Thoughtful prompt construction for LLM interactions."""
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
+import asyncio
+import functools
+import logging
+import os
+import threading
+import orjson
+import tiktoken
 from app.config import settings
+from app.services.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+
+# BPE encoding used for token counts (cl100k_base, a close approximation of Claude's
+# tokenizer), set by load_encoding. Until then counting falls back to ~4 characters per token.
+_encoding: Optional["tiktoken.Encoding"] = None
+_encoding_lock = threading.Lock()
+# Retry delays for warm_up after a failed load (seconds, doubling up to the cap)
+_ENCODING_RETRY_INITIAL_SECONDS = 5.0
+_ENCODING_RETRY_MAX_SECONDS = 300.0
+
+
+def _get_encoding() -> Optional["tiktoken.Encoding"]:
+    """The loaded encoding, or None if it isn't loaded (yet). Never loads: safe on the event loop."""
+    return _encoding
+
+
+def load_encoding() -> Optional["tiktoken.Encoding"]:
+    """
+    Load the encoding and keep it for _get_encoding. Blocking: unless TIKTOKEN_CACHE_DIR
+    already holds it, tiktoken downloads it with no timeout, so call this from a worker
+    thread (see warm_up). A failure is not remembered; the next call tries again.
+    """
+    global _encoding
+    with _encoding_lock:
+        if _encoding is None:
+            try:
+                _encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                logger.warning("Tokenizer unavailable, estimating 4 characters per token: %s", e)
+        return _encoding
+
+
+async def warm_up(first_attempt: Optional[asyncio.Event] = None) -> None:
+    """
+    Load the encoding and measure the static prefix in worker threads, retrying with
+    backoff until the encoding loads. Meant to run as a task from the app's startup;
+    first_attempt is set once the first load has succeeded or failed.
+    """
+    delay = _ENCODING_RETRY_INITIAL_SECONDS
+    while True:
+        try:
+            encoding = await asyncio.to_thread(load_encoding)
+            if encoding is not None:
+                await asyncio.to_thread(PromptBuilder.static_prefix_tokens)
+                return
+        finally:
+            if first_attempt is not None:
+                first_attempt.set()
+        await asyncio.sleep(delay)
+        delay = min(_ENCODING_RETRY_MAX_SECONDS, delay * 2)
+
+
+# Shortest prompt prefix the provider caches, by model name fragment (first match wins)
+_PROMPT_CACHE_MIN_TOKENS = (("haiku-4-5", 4096), ("opus-4-5", 4096), ("haiku", 2048))
+_DEFAULT_PROMPT_CACHE_MIN_TOKENS = 1024
+
+
+def _count_tokens(text: str, encoding: Optional["tiktoken.Encoding"] = None) -> int:
+    """Token count from the BPE tokenizer, if loaded (falls back to 1 token ≈ 4 characters)."""
+    if encoding is None:
+        encoding = _get_encoding()
+    if encoding is None:
+        return len(text) // 4
+    return len(encoding.encode_ordinary(text))
+
+
+def _prompt_cache_min_tokens(model: str) -> int:
+    """Shortest prefix the provider's prompt cache stores for model."""
+    for fragment, min_tokens in _PROMPT_CACHE_MIN_TOKENS:
+        if fragment in model:
+            return min_tokens
+    return _DEFAULT_PROMPT_CACHE_MIN_TOKENS
+
+
+def _use_few_shot(prefix_tokens: int) -> bool:
+    """Whether to send the few-shot examples: per PROMPT_FEW_SHOT_EXAMPLES, else only if the prefix is cacheable."""
+    if settings.prompt_few_shot_examples is not None:
+        return settings.prompt_few_shot_examples
+    return prefix_tokens >= _prompt_cache_min_tokens(settings.claude_model)
+
+# Native encoder threads for batch token counts (tiktoken releases the GIL while encoding)
+_TOKENIZER_THREADS = max(1, min(8, os.cpu_count() or 1))
+
+# Compact, non-ASCII kept, non-string keys stringified. Close to json.dumps(separators=(",", ":"),
+# ensure_ascii=False) but not identical: orjson writes some floats differently (1e-7 vs 1e-07)
+# and NaN/Infinity as null
+_JSON_OPTIONS = orjson.OPT_NON_STR_KEYS
 
 
 class PromptBuilder:
@@ -18,6 +115,102 @@ class PromptBuilder:
 
 Be concise and actionable. Prioritize by importance."""
 
+    # Worked examples appended to the system prompt. Static, so together with SYSTEM_PROMPT
+    # they form a long, byte-identical prefix that the provider can cache across calls.
+    FEW_SHOT_EXAMPLES = """## Example 1
+
+Input:
+## Data
+{"customer_id":"C-1042","event_type":"support_ticket","plan":"enterprise","open_tickets":3,"days_since_first_report":9}
+## Notes
+- Customer cannot export reports to CSV since the last release
+- Workaround via API works but their finance team cannot use it
+- Account manager says renewal is due next month
+
+Output:
+{
+  "summary": "An enterprise customer has been blocked from exporting reports to CSV for 9 days after the last release. The API workaround does not help their finance team, and the renewal is due next month.",
+  "insights": [
+    {"title": "Regression in CSV export", "description": "Export broke with the last release and has stayed open for 9 days across 3 tickets.", "category": "Technical Issue", "priority": "high"},
+    {"title": "Renewal at risk", "description": "An unresolved blocker for a business team right before renewal raises churn risk.", "category": "Business Risk", "priority": "high"},
+    {"title": "Workaround not usable", "description": "The API workaround needs technical skills the finance team does not have.", "category": "Customer Experience", "priority": "medium"}
+  ],
+  "next_actions": [
+    {"action": "Escalate the CSV export regression to engineering as a release blocker", "priority": "high", "rationale": "Known regression affecting an enterprise account"},
+    {"action": "Have the account manager share a fix timeline with the customer", "priority": "high", "rationale": "Protects the upcoming renewal"},
+    {"action": "Offer a one-off manual export until the fix ships", "priority": "medium", "rationale": "Unblocks the finance team now"}
+  ],
+  "confidence_score": 0.9
+}
+
+## Example 2
+
+Input:
+## Data
+{"region":"EMEA","quarter":"Q3","pipeline_value":1250000,"deals_closed":14,"deals_lost":9,"avg_sales_cycle_days":62}
+## Notes
+- Most lost deals cite pricing compared with a new competitor
+- Two large deals slipped to next quarter pending security review
+- New sales hires ramped faster than expected
+
+Output:
+{
+  "summary": "EMEA closed 14 deals in Q3 with a 1.25M pipeline, but lost 9, mostly on price against a new competitor. Two large deals slipped because of security reviews, while new hires ramped quickly.",
+  "insights": [
+    {"title": "Competitive pricing pressure", "description": "Most losses cite price against a new competitor, suggesting a positioning gap.", "category": "Market", "priority": "high"},
+    {"title": "Security review delays", "description": "Security reviews are pushing large deals into the next quarter and lengthening the cycle.", "category": "Sales Process", "priority": "medium"},
+    {"title": "Strong new-hire ramp", "description": "New sales hires are productive earlier than planned.", "category": "Team", "priority": "low"}
+  ],
+  "next_actions": [
+    {"action": "Build a competitive pricing and value brief for the sales team", "priority": "high", "rationale": "Addresses the main loss reason"},
+    {"action": "Prepare a standard security review package for large deals", "priority": "medium", "rationale": "Shortens review-driven slips"},
+    {"action": "Document the onboarding practices of the new hires", "priority": "low", "rationale": "Repeats a successful ramp"}
+  ],
+  "confidence_score": 0.8
+}
+
+## Example 3
+
+Input:
+## Notes
+- Warehouse B reported two late shipments this week
+- Carrier changed pickup time without notice
+
+Output:
+{
+  "summary": "Warehouse B had two late shipments this week after the carrier changed its pickup time without notice.",
+  "insights": [
+    {"title": "Unannounced carrier change", "description": "The pickup time change was not communicated, causing the late shipments.", "category": "Operations", "priority": "medium"}
+  ],
+  "next_actions": [
+    {"action": "Confirm the new pickup schedule with the carrier in writing", "priority": "medium", "rationale": "Prevents further late shipments"}
+  ],
+  "confidence_score": 0.6
+}
+
+Input may have Data, Notes or both. Base every statement on the input; lower confidence_score when data is sparse."""
+
+    # Headroom for message framing the provider adds around system and user text
+    _FRAMING_TOKENS = 64
+
+    @classmethod
+    def get_static_prefix(cls) -> str:
+        """
+        Static system text shared by every call (cacheable by the provider). Never contains
+        request data. Chosen and measured once per tokenizer state (see _static_prefix).
+        """
+        return _static_prefix(_get_encoding())[0]
+
+    @classmethod
+    def static_prefix_tokens(cls) -> int:
+        """Token count of get_static_prefix(), computed once per tokenizer state."""
+        return _static_prefix(_get_encoding())[1]
+
+    @classmethod
+    def remaining_budget(cls, max_tokens: int = 8000) -> int:
+        """Tokens left for the user prompt when the whole input must fit in max_tokens."""
+        return max(0, max_tokens - cls.static_prefix_tokens() - cls._FRAMING_TOKENS)
+
     @staticmethod
     def build_user_prompt(
         structured_data: Optional[Dict[str, Any]],
@@ -40,49 +233,119 @@ Be concise and actionable. Prioritize by importance."""
             parts.append("## Data")
             parts.append(_format_json_compact(structured_data["data"]))
         
-        # Add notes section (more compact)
+        # Add notes section (more compact): one join instead of a formatted string per note
         if notes:
             parts.append("## Notes")
-            for note in notes:
-                parts.append(f"- {note.strip()}")
+            parts.append("- " + "\n- ".join([note.strip() for note in notes]))
         
         # Add analysis instructions (simplified)
         parts.append("\nAnalyze and return JSON only.")
         
         return "\n".join(parts)
     
+    @staticmethod
+    def build_batched_user_prompt(
+        records: List[Tuple[Optional[Dict[str, Any]], List[str]]]
+    ) -> str:
+        """
+        Constructs one user prompt covering several records, so a single call (and a
+        single copy of the system prompt) analyzes all of them.
+        
+        Args:
+            records: (structured_data, notes) per record
+            
+        Returns:
+            Formatted prompt string asking for a JSON array with one analysis per record
+        """
+        parts = []
+        
+        for number, (structured_data, notes) in enumerate(records, start=1):
+            parts.append(f"## Record {number}")
+            if structured_data and structured_data.get("data"):
+                parts.append("### Data")
+                parts.append(_format_json_compact(structured_data["data"]))
+            if notes:
+                parts.append("### Notes")
+                parts.append("- " + "\n- ".join([note.strip() for note in notes]))
+        
+        parts.append(
+            f"\nAnalyze each record separately. Return only a JSON array of {len(records)} "
+            "objects matching the schema, one per record, in record order."
+        )
+        
+        return "\n".join(parts)
+    
     @staticmethod
     def estimate_tokens(text: str) -> int:
         """
-        Rough token estimation (1 token ≈ 4 characters for English text).
+        Token count from the BPE tokenizer (falls back to 1 token ≈ 4 characters).
         Used for context size management.
         """
-        return len(text) // 4
+        return _count_tokens(text)
+    
+    @staticmethod
+    def estimate_tokens_batch(texts: List[str]) -> List[int]:
+        """
+        Token counts for several texts, encoded in parallel by the tokenizer's native threads.
+        Blocking; callers on the event loop can run it with asyncio.to_thread for large inputs.
+        """
+        encoding = _get_encoding()
+        if encoding is None:
+            return [len(text) // 4 for text in texts]
+        return [len(tokens) for tokens in encoding.encode_ordinary_batch(texts, num_threads=_TOKENIZER_THREADS)]
     
     @staticmethod
     def truncate_if_needed(text: str, max_tokens: int = 8000) -> str:
         """
         Truncates text if it exceeds token limit to manage context size.
-        Preserves structure by truncating from the middle.
+        Preserves structure by truncating from the middle, cutting on token boundaries.
         """
-        estimated_tokens = PromptBuilder.estimate_tokens(text)
-        
-        if estimated_tokens <= max_tokens:
+        # Fast path without tokenizing: a token covers at least one UTF-8 byte, so text with
+        # at most max_tokens bytes (ASCII: characters; otherwise at most 4 bytes each) fits.
+        if len(text) * (1 if text.isascii() else 4) <= max_tokens:
             return text
         
-        # Truncate from middle, preserving beginning and end
-        max_chars = max_tokens * 4
-        half = max_chars // 2
+        encoding = _get_encoding()
+        if encoding is None:
+            if PromptBuilder.estimate_tokens(text) <= max_tokens:
+                return text
+            # Truncate from middle by the 4-characters-per-token estimate
+            half = max_tokens * 4 // 2
+            return (
+                text[:half] + 
+                "\n\n[... content truncated for length ...]\n\n" + 
+                text[-half:]
+            )
         
+        # Encode once; keep the first and last max_tokens/2 tokens
+        tokens = encoding.encode_ordinary(text)
+        if len(tokens) <= max_tokens:
+            return text
+        half = max_tokens // 2
         return (
-            text[:half] + 
+            encoding.decode(tokens[:half]) + 
             "\n\n[... content truncated for length ...]\n\n" + 
-            text[-half:]
+            encoding.decode(tokens[-half:])
         )
 
 
-def _format_json_compact(data: Dict[str, Any], indent: int = 0) -> str:
-    """Format JSON in a compact but readable way."""
-    import json
-    return json.dumps(data, indent=2, ensure_ascii=False)
+@functools.lru_cache(maxsize=2)
+def _static_prefix(encoding: Optional["tiktoken.Encoding"]) -> Tuple[str, int]:
+    """
+    System text sent before every user message, with its token count under encoding
+    (None: the 4-characters estimate). Cached per encoding, so loading the tokenizer
+    later replaces the estimate. The few-shot examples only pay off once the provider
+    caches them, so below the model's cache minimum they are left out (unless
+    PROMPT_FEW_SHOT_EXAMPLES says otherwise).
+    """
+    with_examples = PromptBuilder.SYSTEM_PROMPT + "\n\n" + PromptBuilder.FEW_SHOT_EXAMPLES
+    use_examples = _use_few_shot(_count_tokens(with_examples, encoding))
+    prefix = with_examples if use_examples else PromptBuilder.SYSTEM_PROMPT
+    return prefix, _count_tokens(prefix, encoding)
+
+
+def _format_json_compact(data: Dict[str, Any]) -> str:
+    """Format JSON without whitespace: newlines and indentation cost prompt tokens."""
+    # dumps falls back to the stdlib for integers orjson can't encode (wider than 64 bits)
+    return dumps(data, option=_JSON_OPTIONS).decode()
 
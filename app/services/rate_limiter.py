@@ -1,36 +1,131 @@
 """
 Rate limiter for LLM API calls.
-Respects Claude API limit: 50 requests/minute (configurable).
+Respects Claude API limits: 50 requests/minute and 80K tokens/minute (configurable).
 Used by batch processor so we never exceed provider limits.
 """
 import asyncio
+import threading
 import time
 from collections import deque
-from typing import Deque
+from typing import Deque, Optional
 
 
 class RateLimiter:
     """
-    Sliding-window rate limiter: max N requests per minute.
-    acquire() is async and waits until a slot is available.
+    Token-bucket rate limiter for requests/minute (RPM) and tokens/minute (TPM).
+    Both buckets start full and refill continuously, mirroring how the provider
+    enforces its limits. aacquire() is async and waits until both budgets allow the call.
     """
 
-    def __init__(self, requests_per_minute: int = 50):
+    def __init__(self, requests_per_minute: int = 50, tokens_per_minute: Optional[int] = None):
         self._rpm = max(1, requests_per_minute)
+        self._tpm = max(1, tokens_per_minute) if tokens_per_minute else None
         self._window_seconds = 60.0
-        self._timestamps: Deque[float] = deque()
-        self._lock = asyncio.Lock()
+        # Refill rates per second, precomputed so an admit does no divisions
+        self._request_rate = self._rpm / self._window_seconds
+        self._token_rate = self._tpm / self._window_seconds if self._tpm else 0.0
+        self._request_allowance = float(self._rpm)
+        self._token_allowance = float(self._tpm or 0)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
 
-    async def acquire(self) -> None:
-        """Wait until we can make one request without exceeding the limit."""
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._request_allowance = min(float(self._rpm), self._request_allowance + elapsed * self._request_rate)
+        if self._tpm:
+            self._token_allowance = min(float(self._tpm), self._token_allowance + elapsed * self._token_rate)
+
+    def _try_reserve(self, tokens: int) -> float:
+        """Reserve one request and `tokens` tokens. Returns 0 on success, else seconds to wait."""
+        with self._lock:
+            self._refill(time.monotonic())
+            # A single call larger than the whole budget can never fit; cap it at a full bucket.
+            tokens = min(tokens, self._tpm) if self._tpm else 0
+            wait_rpm = (1.0 - self._request_allowance) / self._request_rate
+            wait_tpm = (tokens - self._token_allowance) / self._token_rate if self._tpm else 0.0
+            wait = max(wait_rpm, wait_tpm)
+            if wait <= 0:
+                self._request_allowance -= 1.0
+                self._token_allowance -= tokens
+                return 0.0
+            return wait
+
+    async def aacquire(self, tokens: int = 0) -> None:
+        """Wait until one request using about `tokens` tokens fits in both RPM and TPM budgets."""
         while True:
-            async with self._lock:
-                now = time.monotonic()
-                while self._timestamps and self._timestamps[0] < now - self._window_seconds:
-                    self._timestamps.popleft()
-                if len(self._timestamps) < self._rpm:
-                    self._timestamps.append(time.monotonic())
+            wait = self._try_reserve(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    async def acquire(self) -> None:
+        """Wait until we can make one request without exceeding the RPM limit."""
+        await self.aacquire(0)
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD (additive-increase, multiplicative-decrease) limit on in-flight LLM calls.
+    Each success raises the limit by `increase`; an overload signal (429/529) multiplies it
+    by `decrease`, at most once per cooldown so one burst of 429s only halves it once.
+    Optionally, a p95 latency above `latency_target_ms` counts as overload too.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        minimum: int = 1,
+        maximum: int = 20,
+        increase: float = 0.5,
+        decrease: float = 0.5,
+        latency_target_ms: Optional[float] = None,
+        cooldown_seconds: float = 5.0,
+    ):
+        self._min = max(1, minimum)
+        self._max = max(self._min, maximum)
+        self._limit = float(min(self._max, max(self._min, initial)))
+        self._increase = increase
+        self._decrease = decrease
+        self._latency_target_ms = latency_target_ms
+        self._cooldown_seconds = cooldown_seconds
+        self._last_decrease = float("-inf")
+        self._latencies: Deque[float] = deque(maxlen=50)
+        self._in_flight = 0
+        self._cond = asyncio.Condition()
+
+    @property
+    def limit(self) -> int:
+        """Current number of calls allowed in flight."""
+        return int(self._limit)
+
+    async def acquire(self) -> None:
+        """Wait until a call slot is free under the current limit."""
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._in_flight < int(self._limit))
+            self._in_flight += 1
+
+    async def release(self) -> None:
+        """Free a slot taken by acquire() and wake waiters (the limit may have grown)."""
+        async with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def on_success(self, latency_ms: float) -> None:
+        """Record a successful call; grows the limit unless p95 latency is over target."""
+        if self._latency_target_ms is not None:
+            self._latencies.append(latency_ms)
+            if len(self._latencies) >= 10:
+                p95 = sorted(self._latencies)[int(len(self._latencies) * 0.95) - 1]
+                if p95 > self._latency_target_ms:
+                    self.on_overload()
                     return
-                sleep_until = self._timestamps[0] + self._window_seconds - now
-            if sleep_until > 0:
-                await asyncio.sleep(sleep_until)
+        self._limit = min(float(self._max), self._limit + self._increase)
+
+    def on_overload(self) -> None:
+        """Record a rate-limit/overload signal; shrinks the limit (once per cooldown)."""
+        now = time.monotonic()
+        if now - self._last_decrease < self._cooldown_seconds:
+            return
+        self._last_decrease = now
+        self._limit = max(float(self._min), self._limit * self._decrease)
@@ -0,0 +1,39 @@
+"""JSON encoding shared by the cache, prompts and persistence."""
+import json
+import re
+from typing import Any, Optional
+
+import orjson
+
+# A run of 20+ digits may be an integer beyond orjson's 64-bit range
+_LONG_DIGITS_RE = re.compile(rb"\d{20}")
+
+
+def dumps(obj: Any, option: Optional[int] = None) -> bytes:
+    """
+    orjson.dumps, falling back to the standard library for valid JSON that orjson rejects
+    (integers wider than 64 bits). The fallback is compact, keeps non-ASCII as-is, honors
+    OPT_SORT_KEYS and OPT_INDENT_2, and converts non-string keys like OPT_NON_STR_KEYS.
+    """
+    try:
+        return orjson.dumps(obj, option=option)
+    except orjson.JSONEncodeError:
+        option = option or 0
+        indent = 2 if option & orjson.OPT_INDENT_2 else None
+        return json.dumps(
+            obj,
+            sort_keys=bool(option & orjson.OPT_SORT_KEYS),
+            indent=indent,
+            separators=(",", ": ") if indent else (",", ":"),
+            ensure_ascii=False,
+        ).encode()
+
+
+def loads(data: bytes) -> Any:
+    """
+    orjson.loads, except documents with a 20+ digit number go through the standard library:
+    orjson reads integers beyond 64 bits as floats, which would silently lose precision.
+    """
+    if _LONG_DIGITS_RE.search(data):
+        return json.loads(data)
+    return orjson.loads(data)
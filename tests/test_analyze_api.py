@@ -131,3 +131,43 @@ async def test_analyze_rejects_missing_notes():
         response = await client.post(ANALYZE_URL, json={})
 
     assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+@patch("app.api.routes.ai_service.analyze", new_callable=AsyncMock, return_value=make_mock_analyze_response())
+async def test_analyze_accepts_integers_wider_than_64_bits(mock_analyze):
+    """Assert 200 (not 500) for structured data holding an integer orjson can't encode."""
+    body = {"structured_data": {"data": {"account": 123456789012345678901234567890}}, "notes": ["n"]}
+    async with AsyncClient(app=app, base_url=BASE_URL) as client:
+        response = await client.post(ANALYZE_URL, json=body)
+
+    assert response.status_code == 200
+    assert mock_analyze.await_args.args[0] == {"account": 123456789012345678901234567890}
+
+
+def test_prompt_formats_integers_wider_than_64_bits():
+    """Prompt building keeps big integers exact instead of raising."""
+    from app.services.prompt_builder import PromptBuilder
+
+    prompt = PromptBuilder.build_user_prompt({"data": {"account": 123456789012345678901234567890}}, ["n"])
+    assert '{"account":123456789012345678901234567890}' in prompt
+
+
+@pytest.mark.asyncio
+async def test_cors_allows_only_configured_origins():
+    """Origins in CORS_ORIGINS get Access-Control-Allow-Origin; any other origin gets none."""
+    from app.config import settings
+
+    allowed = settings.cors_origins[0]
+    async with AsyncClient(app=app, base_url=BASE_URL) as client:
+        ok = await client.get(f"{BASE_URL}/api/v1/health", headers={"Origin": allowed})
+        denied = await client.get(f"{BASE_URL}/api/v1/health", headers={"Origin": "https://evil.example.com"})
+        preflight = await client.options(
+            ANALYZE_URL,
+            headers={"Origin": "https://evil.example.com", "Access-Control-Request-Method": "POST"},
+        )
+
+    assert ok.headers["access-control-allow-origin"] == allowed
+    assert "access-control-allow-origin" not in denied.headers
+    assert preflight.status_code == 400
+    assert "access-control-allow-origin" not in preflight.headers
@@ -1,11 +1,13 @@
 """Tests for batch analyze API."""
 import asyncio
+import json
 from unittest.mock import AsyncMock, patch
 import pytest
 from httpx import AsyncClient
 
 from app.main import app
 from app.models.schemas import AnalyzeResponse, Insight, NextAction, Metadata
+from app.services.ai_service import AIServiceError
 from app.services.batch_job_store import batch_job_store
 from datetime import datetime, timezone
 
@@ -114,6 +116,57 @@ async def test_batch_analyze_rejects_empty_records():
     assert response.status_code == 422
 
 
+@pytest.mark.asyncio
+async def test_batch_analyze_422_body_matches_fastapi_shape():
+    """422 details keep FastAPI's body validation shape: loc starts with "body"; bad JSON reports the decode position."""
+    async with AsyncClient(app=app, base_url=BASE_URL) as client:
+        invalid = await client.post(BATCH_ANALYZE_URL, json={"records": [{}]})
+        malformed = await client.post(
+            BATCH_ANALYZE_URL, content=b'{"records":[{"notes":"a"}]', headers={"content-type": "application/json"}
+        )
+
+    assert invalid.status_code == 422
+    detail = invalid.json()["detail"]
+    assert [(d["type"], d["loc"], d["msg"]) for d in detail] == [
+        ("missing", ["body", "records", 0, "notes"], "Field required")
+    ]
+    assert malformed.status_code == 422
+    assert malformed.json() == {"detail": [{
+        "type": "json_invalid",
+        "loc": ["body", 26],
+        "msg": "JSON decode error",
+        "input": {},
+        "ctx": {"error": "Expecting ',' delimiter"},
+    }]}
+
+
+_ATTRIBUTES_TYPE_MSG = "Input should be a valid dictionary or object to extract fields from"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "content, content_type, expected",
+    [
+        (b"null", "application/json", ("missing", ["body"], "Field required", None)),
+        (b"[1]", "application/json", ("model_attributes_type", ["body"], _ATTRIBUTES_TYPE_MSG, [1])),
+        (
+            b'{"records":[{"notes":"a"}]}',
+            "text/plain",
+            ("model_attributes_type", ["body"], _ATTRIBUTES_TYPE_MSG, '{"records":[{"notes":"a"}]}'),
+        ),
+    ],
+)
+@patch("app.api.routes.ai_service.analyze", new_callable=AsyncMock, return_value=make_mock_analyze_response())
+async def test_batch_analyze_rejects_bodies_like_fastapi(mock_analyze, content, content_type, expected):
+    """A null body is missing, a non-object is not a model, and a non-JSON content type is not decoded."""
+    async with AsyncClient(app=app, base_url=BASE_URL) as client:
+        response = await client.post(BATCH_ANALYZE_URL, content=content, headers={"content-type": content_type})
+
+    assert response.status_code == 422
+    assert [(d["type"], d["loc"], d["msg"], d["input"]) for d in response.json()["detail"]] == [expected]
+    mock_analyze.assert_not_awaited()
+
+
 @pytest.mark.asyncio
 async def test_batch_analyze_rejects_over_500_records():
     """POST /batch/analyze returns 422 when records exceed 500."""
@@ -134,3 +187,410 @@ async def test_batch_list_jobs_returns_200_and_jobs_array():
     data = response.json()
     assert "jobs" in data
     assert isinstance(data["jobs"], list)
+
+
+@pytest.mark.asyncio
+@patch("app.api.routes.ai_service.analyze", new_callable=AsyncMock, return_value=make_mock_analyze_response())
+async def test_batch_events_streams_until_completed(mock_analyze, valid_batch_request):
+    """GET /batch/{job_id}/events streams SSE progress and ends with a terminal status event."""
+    async with AsyncClient(app=app, base_url=BASE_URL) as client:
+        submit = await client.post(BATCH_ANALYZE_URL, json=valid_batch_request)
+        assert submit.status_code == 202
+        job_id = submit.json()["job_id"]
+        response = await client.get(f"{BASE_URL}/api/v1/batch/{job_id}/events")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [
+        json.loads(line[len("data: "):])
+        for line in response.text.splitlines()
+        if line.startswith("data: ")
+    ]
+    assert events, "No SSE events received"
+    assert events[-1]["event"] == "status"
+    assert events[-1]["status"] == "completed"
+    assert events[-1]["completed_count"] == 2
+
+
+@pytest.mark.asyncio
+async def test_batch_events_404_for_unknown_job():
+    """GET /batch/{job_id}/events returns 404 for unknown job_id."""
+    async with AsyncClient(app=app, base_url=BASE_URL) as client:
+        response = await client.get(f"{BASE_URL}/api/v1/batch/00000000-0000-0000-0000-000000000000/events")
+    assert response.status_code == 404
+
+
+async def _wait_for_completed_status(client, job_id):
+    """Poll /status until the job leaves the running states; returns the last status body."""
+    for _ in range(50):
+        st = (await client.get(f"{BASE_URL}/api/v1/batch/{job_id}/status")).json()
+        if st["status"] in ("completed", "failed"):
+            return st
+        await asyncio.sleep(0.1)
+    raise AssertionError("Batch did not complete within timeout")
+
+
+@pytest.mark.asyncio
+@patch("app.api.routes._BATCH_RECORDS_PER_LLM_CALL", 4)
+@patch("app.api.routes.ai_service.analyze", new_callable=AsyncMock, return_value=make_mock_analyze_response())
+@patch("app.api.routes.ai_service.analyze_batch", new_callable=AsyncMock)
+async def test_batch_groups_records_into_one_llm_call(mock_analyze_batch, mock_analyze):
+    """With batch_records_per_llm_call > 1, records are analyzed together in one call."""
+    mock_analyze_batch.side_effect = lambda records: [make_mock_analyze_response() for _ in records]
+    request = {"records": [{"notes": f"Grouped note {i}."} for i in range(3)]}
+    async with AsyncClient(app=app, base_url=BASE_URL) as client:
+        submit = await client.post(BATCH_ANALYZE_URL, json=request)
+        st = await _wait_for_completed_status(client, submit.json()["job_id"])
+
+    assert st["status"] == "completed"
+    assert st["completed_count"] == 3
+    assert sorted(r["index"] for r in st["results"]) == [0, 1, 2]
+    mock_analyze_batch.assert_awaited_once()
+    assert len(mock_analyze_batch.await_args.args[0]) == 3
+    mock_analyze.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+@patch("app.api.routes._BATCH_RECORDS_PER_LLM_CALL", 4)
+@patch("app.api.routes.ai_service.analyze", new_callable=AsyncMock, return_value=make_mock_analyze_response())
+@patch("app.api.routes.ai_service.analyze_batch", new_callable=AsyncMock)
+async def test_batch_group_falls_back_to_single_calls(mock_analyze_batch, mock_analyze):
+    """A failed grouped call retries its records one by one instead of failing them."""
+    mock_analyze_batch.side_effect = AIServiceError("Expected a JSON array of 2 analyses, got 1")
+    request = {"records": [{"notes": f"Fallback note {i}."} for i in range(2)]}
+    async with AsyncClient(app=app, base_url=BASE_URL) as client:
+        submit = await client.post(BATCH_ANALYZE_URL, json=request)
+        st = await _wait_for_completed_status(client, submit.json()["job_id"])
+
+    assert st["status"] == "completed"
+    assert st["completed_count"] == 2
+    assert mock_analyze.await_count == 2
+
+
+@pytest.mark.asyncio
+@patch("app.api.routes._BATCH_RECORDS_PER_LLM_CALL", 8)
+@patch("app.api.routes._BATCH_GROUP_MAX_RECORDS", 3)
+@patch("app.api.routes.ai_service.analyze", new_callable=AsyncMock, return_value=make_mock_analyze_response())
+@patch("app.api.routes.ai_service.analyze_batch", new_callable=AsyncMock)
+async def test_batch_groups_capped_by_output_budget(mock_analyze_batch, mock_analyze):
+    """A group never holds more records than one call's output cap can answer."""
+    mock_analyze_batch.side_effect = lambda records: [make_mock_analyze_response() for _ in records]
+    request = {"records": [{"notes": f"Capped note {i}."} for i in range(7)]}
+    async with AsyncClient(app=app, base_url=BASE_URL) as client:
+        submit = await client.post(BATCH_ANALYZE_URL, json=request)
+        st = await _wait_for_completed_status(client, submit.json()["job_id"])
+
+    assert st["status"] == "completed"
+    assert st["completed_count"] == 7
+    assert [len(call.args[0]) for call in mock_analyze_batch.await_args_list] == [3, 3]
+    mock_analyze.assert_awaited_once()
+
+
+def test_finished_jobs_evicted_from_memory_and_reloaded(tmp_path, monkeypatch):
+    """With a durable backend only the newest finished jobs stay in memory; older ones reload from storage."""
+    from app.config import settings
+    from app.services.batch_job_store import BatchJobStore
+
+    monkeypatch.setattr(settings, "batch_persistence_backend", "file")
+    monkeypatch.setattr(settings, "batch_job_storage_path", str(tmp_path))
+    monkeypatch.setattr(settings, "batch_max_cached_finished_jobs", 1)
+    store = BatchJobStore()
+    first, second = store.create_job(1), store.create_job(1)
+    for job_id in (first, second):
+        store.append_result(job_id, 0, True, response=make_mock_analyze_response(), tokens_used=50)
+        store.set_job_completed(job_id)
+
+    assert first not in store._jobs
+    assert second in store._jobs
+    st = store.get_status_response(first)
+    assert st["status"] == "completed"
+    assert st["results"][0]["response"]["summary"] == "Test summary."
+    assert second not in store._jobs
+
+
+@pytest.mark.asyncio
+@patch("app.api.routes.ai_service.analyze", new_callable=AsyncMock, return_value=make_mock_analyze_response())
+async def test_batch_record_key_error_fails_only_that_record(mock_analyze):
+    """A record whose cache key can't be computed fails alone; the rest of the batch completes."""
+    from app.services.cache_service import cache_service
+
+    real_make_key = cache_service.make_key
+
+    def make_key(structured_data, notes):
+        if notes == ["Bad note."]:
+            raise TypeError("Integer exceeds 64-bit range")
+        return real_make_key(structured_data, notes)
+
+    request = {"records": [{"notes": "Bad note."}, {"notes": "Good note."}]}
+    with patch("app.api.routes.cache_service.make_key", side_effect=make_key):
+        async with AsyncClient(app=app, base_url=BASE_URL) as client:
+            submit = await client.post(BATCH_ANALYZE_URL, json=request)
+            st = await _wait_for_completed_status(client, submit.json()["job_id"])
+
+    assert st["status"] == "completed"
+    assert (st["completed_count"], st["failed_count"]) == (1, 1)
+    failed = [r for r in st["results"] if not r["success"]]
+    assert failed[0]["index"] == 0
+    assert "64-bit" in failed[0]["error"]
+
+
+def test_pending_records_keep_integers_wider_than_64_bits(tmp_path, monkeypatch):
+    """File backend: pending records with big integers are written and read back exactly."""
+    from app.config import settings
+    from app.services.batch_job_store import BatchJobStore
+
+    monkeypatch.setattr(settings, "batch_persistence_backend", "file")
+    monkeypatch.setattr(settings, "batch_job_storage_path", str(tmp_path))
+    store = BatchJobStore()
+    job_id = store.create_job(2)
+    items = [({"account": 123456789012345678901234567890}, ["Big."]), (None, ["Plain."])]
+
+    assert store.persist_pending_records(job_id, items)
+    assert list(store.iter_pending_records(job_id)) == items
+
+
+@pytest.mark.asyncio
+@patch("app.api.routes.ai_service.analyze", new_callable=AsyncMock, return_value=make_mock_analyze_response())
+async def test_batch_accepts_integers_wider_than_64_bits(mock_analyze):
+    """Records holding integers orjson can't encode are keyed, estimated and analyzed like any other."""
+    request = {"records": [
+        {"structured_data": {"data": {"account": 123456789012345678901234567890}}, "notes": "Big account."},
+        {"notes": "Plain note."},
+    ]}
+    async with AsyncClient(app=app, base_url=BASE_URL) as client:
+        submit = await client.post(BATCH_ANALYZE_URL, json=request)
+        st = await _wait_for_completed_status(client, submit.json()["job_id"])
+
+    assert st["status"] == "completed"
+    assert (st["completed_count"], st["failed_count"]) == (2, 0)
+
+
+async def _run_analyze_with_retries(side_effect, max_attempts=3):
+    """Run one record through _analyze_with_retries with a failing/succeeding LLM; returns (outcome, analyze mock, sleeps)."""
+    from app.api import routes
+    from app.services.rate_limiter import AdaptiveConcurrencyLimiter
+
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+
+    with patch("app.api.routes.ai_service.analyze", new_callable=AsyncMock, side_effect=side_effect) as mock_analyze, \
+            patch("app.api.routes._rate_limiter.aacquire", new_callable=AsyncMock), \
+            patch("app.api.routes._BATCH_MAX_ATTEMPTS", max_attempts), \
+            patch("app.api.routes.random.uniform", return_value=1.0), \
+            patch("app.api.routes.asyncio.sleep", fake_sleep):
+        try:
+            outcome = await routes._analyze_with_retries(0, None, ["note"], AdaptiveConcurrencyLimiter(initial=2))
+        except AIServiceError as e:
+            outcome = e
+    return outcome, mock_analyze, sleeps
+
+
+@pytest.mark.asyncio
+async def test_retry_honors_retry_after_on_429():
+    """A 429 with Retry-After waits exactly that long, then the retry succeeds."""
+    response = make_mock_analyze_response()
+    outcome, mock_analyze, sleeps = await _run_analyze_with_retries(
+        [AIServiceError("rate limited", status_code=429, retry_after=7.0), response]
+    )
+    assert outcome is response
+    assert mock_analyze.await_count == 2
+    assert sleeps == [7.0]
+
+
+@pytest.mark.asyncio
+async def test_retry_backs_off_exponentially_on_503():
+    """5xx without Retry-After backs off 0.5s, 1s, ... and raises the last error when attempts run out."""
+    outcome, mock_analyze, sleeps = await _run_analyze_with_retries(
+        AIServiceError("overloaded", status_code=503)
+    )
+    assert isinstance(outcome, AIServiceError)
+    assert outcome.status_code == 503
+    assert mock_analyze.await_count == 3
+    assert sleeps == [0.5, 1.0]
+
+
+@pytest.mark.asyncio
+async def test_retry_fails_fast_on_400():
+    """A 4xx other than 429 is not retried."""
+    outcome, mock_analyze, sleeps = await _run_analyze_with_retries(
+        AIServiceError("bad request", status_code=400)
+    )
+    assert isinstance(outcome, AIServiceError)
+    assert mock_analyze.await_count == 1
+    assert sleeps == []
+
+
+@pytest.mark.asyncio
+@patch("app.api.routes.ai_service.analyze", new_callable=AsyncMock)
+async def test_batch_duplicates_share_one_llm_call(mock_analyze):
+    """Identical records in a batch make one LLM call; every copy gets its response."""
+    async def slow_analyze(structured_data, notes):
+        await asyncio.sleep(0.05)
+        return make_mock_analyze_response()
+
+    mock_analyze.side_effect = slow_analyze
+    request = {"records": [{"notes": "Duplicate note shared by all."} for _ in range(4)]}
+    async with AsyncClient(app=app, base_url=BASE_URL) as client:
+        submit = await client.post(BATCH_ANALYZE_URL, json=request)
+        st = await _wait_for_completed_status(client, submit.json()["job_id"])
+
+    assert st["status"] == "completed"
+    assert (st["completed_count"], st["failed_count"]) == (4, 0)
+    assert sorted(r["index"] for r in st["results"]) == [0, 1, 2, 3]
+    mock_analyze.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+@patch("app.api.routes.ai_service.analyze", new_callable=AsyncMock)
+async def test_batch_duplicates_fail_with_their_leader(mock_analyze):
+    """When the first of identical records fails, its duplicates fail with the same error instead of calling again."""
+    async def failing_analyze(structured_data, notes):
+        await asyncio.sleep(0.05)
+        raise AIServiceError("bad request", status_code=400)
+
+    mock_analyze.side_effect = failing_analyze
+    request = {"records": [{"notes": "Duplicate note that fails."} for _ in range(4)]}
+    async with AsyncClient(app=app, base_url=BASE_URL) as client:
+        submit = await client.post(BATCH_ANALYZE_URL, json=request)
+        st = await _wait_for_completed_status(client, submit.json()["job_id"])
+
+    assert st["status"] == "completed"
+    assert (st["completed_count"], st["failed_count"]) == (0, 4)
+    assert all(r["error"] == "bad request" for r in st["results"])
+    mock_analyze.assert_awaited_once()
+
+
+def test_file_backend_round_trip(tmp_path, monkeypatch):
+    """File backend: results are appended to results.jsonl and a fresh store reloads the job."""
+    from app.config import settings
+    from app.services.batch_job_store import BatchJobStore
+
+    monkeypatch.setattr(settings, "batch_persistence_backend", "file")
+    monkeypatch.setattr(settings, "batch_job_storage_path", str(tmp_path))
+    store = BatchJobStore()
+    job_id = store.create_job(2)
+    store.append_result(job_id, 0, True, response=make_mock_analyze_response(), tokens_used=50)
+    store.append_result(job_id, 1, False, error="bad request")
+    store.set_job_completed(job_id)
+
+    assert len((tmp_path / job_id / "results.jsonl").read_bytes().splitlines()) == 2
+    assert not list(tmp_path.glob("**/*.tmp"))
+    st = BatchJobStore().get_status_response(job_id)
+    assert st["status"] == "completed"
+    assert (st["completed_count"], st["failed_count"], st["total_tokens_used"]) == (1, 1, 50)
+    assert [(r["index"], r["success"], r["error"]) for r in st["results"]] == [
+        (0, True, None), (1, False, "bad request")
+    ]
+    assert st["results"][0]["response"]["summary"] == "Test summary."
+
+
+def test_file_backend_meta_survives_failed_write(tmp_path, monkeypatch):
+    """meta.json is replaced atomically: a write that dies midway leaves the previous state readable."""
+    from app.config import settings
+    from app.services import batch_job_store as store_module
+    from app.services.batch_job_store import BatchJobStore
+
+    monkeypatch.setattr(settings, "batch_persistence_backend", "file")
+    monkeypatch.setattr(settings, "batch_job_storage_path", str(tmp_path))
+    store = BatchJobStore()
+    job_id = store.create_job(1)
+
+    def crash(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(store_module.os, "replace", crash)
+    with pytest.raises(OSError):
+        store.set_processing(job_id)
+    monkeypatch.undo()
+
+    meta = json.loads((tmp_path / job_id / "meta.json").read_bytes())
+    assert meta["status"] == "accepted"
+
+
+def test_sqlite_backend_inserts_only_new_results_and_reloads(tmp_path, monkeypatch):
+    """SQLite backend: each append inserts just its row; a fresh store reloads the job and keeps appending."""
+    import sqlite3
+
+    from app.config import settings
+    from app.services.batch_job_store import BatchJobStore
+
+    db_path = tmp_path / "batch.db"
+    monkeypatch.setattr(settings, "batch_persistence_backend", "sqlite")
+    monkeypatch.setattr(settings, "batch_sqlite_path", str(db_path))
+    store = BatchJobStore()
+    job_id = store.create_job(3)
+    store.append_result(job_id, 0, True, response=make_mock_analyze_response(), tokens_used=50)
+    store.append_result(job_id, 1, False, error="bad request")
+    store.set_processing(job_id)
+
+    def rows():
+        with sqlite3.connect(db_path) as conn:
+            return conn.execute(
+                "SELECT record_index, success, error FROM batch_results WHERE job_id = ? ORDER BY record_index",
+                (job_id,),
+            ).fetchall()
+
+    assert rows() == [(0, 1, None), (1, 0, "bad request")]
+    assert store._persisted_counts[job_id] == 2
+
+    reloaded = BatchJobStore()
+    st = reloaded.get_status_response(job_id)
+    assert (st["completed_count"], st["failed_count"], st["total_tokens_used"]) == (1, 1, 50)
+    assert st["results"][0]["response"]["summary"] == "Test summary."
+    reloaded.append_result(job_id, 2, True, response=make_mock_analyze_response(), tokens_used=50)
+    reloaded.set_job_completed(job_id)
+
+    assert rows() == [(0, 1, None), (1, 0, "bad request"), (2, 1, None)]
+    st = BatchJobStore().get_status_response(job_id)
+    assert st["status"] == "completed"
+    assert (st["completed_count"], st["total_tokens_used"]) == (2, 100)
+
+
+def test_file_index_compacted_to_one_line_per_job(tmp_path, monkeypatch):
+    """index.jsonl is compacted as status changes pile up; list_jobs still sees the latest state."""
+    from app.config import settings
+    from app.services import batch_job_store as store_module
+    from app.services.batch_job_store import BatchJobStore
+
+    monkeypatch.setattr(settings, "batch_persistence_backend", "file")
+    monkeypatch.setattr(settings, "batch_job_storage_path", str(tmp_path))
+    monkeypatch.setattr(store_module, "_INDEX_COMPACT_MIN_BYTES", 1)
+    store = BatchJobStore()
+    job_ids = [store.create_job(1) for _ in range(3)]
+    for job_id in job_ids:
+        store.set_processing(job_id)
+        store.set_job_completed(job_id)
+
+    index_lines = (tmp_path / "index.jsonl").read_bytes().splitlines()
+    assert len(index_lines) < 9
+    with store._index_lock:
+        store._compact_index()
+    assert len((tmp_path / "index.jsonl").read_bytes().splitlines()) == 3
+    store._jobs.clear()
+    jobs = {job["job_id"]: job["status"] for job in BatchJobStore().list_jobs()}
+    assert jobs == {job_id: "completed" for job_id in job_ids}
+
+
+@pytest.mark.asyncio
+@patch("app.api.routes._BATCH_RECORDS_PER_LLM_CALL", 4)
+@patch("app.api.routes.PromptBuilder.estimate_tokens_batch", side_effect=RuntimeError("tokenizer failed"))
+@patch("app.api.routes.ai_service.analyze", new_callable=AsyncMock, return_value=make_mock_analyze_response())
+@patch("app.api.routes.ai_service.analyze_batch", new_callable=AsyncMock)
+async def test_batch_group_tokenization_error_fails_only_its_records(
+    mock_analyze_batch, mock_analyze, mock_estimate
+):
+    """A group whose token counting fails fails its records and their duplicates; the batch still completes."""
+    notes = ["Token A.", "Token B.", "Token A.", "Token C.", "Token D."]
+    request = {"records": [{"notes": note} for note in notes]}
+    async with AsyncClient(app=app, base_url=BASE_URL) as client:
+        submit = await client.post(BATCH_ANALYZE_URL, json=request)
+        st = await _wait_for_completed_status(client, submit.json()["job_id"])
+
+    assert st["status"] == "completed"
+    assert (st["completed_count"], st["failed_count"]) == (1, 4)
+    failed = sorted(r["index"] for r in st["results"] if not r["success"])
+    assert failed == [0, 1, 2, 3]
+    assert all(r["error"] == "tokenizer failed" for r in st["results"] if not r["success"])
+    mock_analyze_batch.assert_not_awaited()
@@ -0,0 +1,52 @@
+"""Tests for the compressed response cache."""
+from datetime import datetime, timezone
+
+from cachetools import TTLCache
+
+from app.models.schemas import AnalyzeResponse, Insight, Metadata, NextAction
+from app.services.cache_service import CacheService
+
+
+def make_response(summary="Cached summary."):
+    """Build a valid AnalyzeResponse to cache."""
+    return AnalyzeResponse(
+        summary=summary,
+        insights=[Insight(title="Insight", description="Described.", category="support", priority="high")],
+        next_actions=[NextAction(action="Follow up.", priority="high", rationale="Test.")],
+        metadata=Metadata(
+            confidence_score=0.9,
+            model_version="test-model",
+            processing_time_ms=100.0,
+            tokens_used=50,
+            timestamp=datetime.now(timezone.utc),
+        ),
+    )
+
+
+def test_compressed_round_trip():
+    """Responses are stored zstd-compressed and come back equal, as a model or as JSON bytes."""
+    cache = CacheService()
+    response = make_response("x" * 2000)
+    cache.set({"account": 1}, ["note"], response)
+
+    key = cache.make_key({"account": 1}, ["note"])
+    assert len(cache.cache[key]) < len(response.model_dump_json())
+    assert cache.get({"account": 1}, ["note"]) == response
+    assert cache.get_json({"account": 1}, ["note"]) == response.model_dump_json().encode()
+
+
+def test_entries_expire_after_ttl_and_lru_is_evicted():
+    """Entries expire after the TTL; when full, the least recently used entry goes first."""
+    now = [0.0]
+    cache = CacheService()
+    cache.cache = TTLCache(maxsize=2, ttl=60, timer=lambda: now[0])
+    cache.set(None, ["a"], make_response("a"))
+    cache.set(None, ["b"], make_response("b"))
+    assert cache.get(None, ["a"]).summary == "a"  # "a" is now the most recently used
+    cache.set(None, ["c"], make_response("c"))
+
+    assert cache.get(None, ["b"]) is None
+    assert cache.get(None, ["a"]).summary == "a"
+    now[0] = 61.0
+    assert cache.get(None, ["a"]) is None
+    assert cache.get(None, ["c"]) is None
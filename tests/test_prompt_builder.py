@@ -0,0 +1,150 @@
+"""Tests for prompt construction and token budgeting."""
+import pytest
+
+from app.config import settings
+from app.services import prompt_builder
+from app.services.prompt_builder import PromptBuilder
+
+
+@pytest.mark.parametrize(
+    "model, expected",
+    [
+        ("claude-3-5-haiku-20241022", 2048),
+        ("claude-haiku-4-5", 4096),
+        ("claude-opus-4-5", 4096),
+        ("claude-3-5-sonnet-20241022", 1024),
+    ],
+)
+def test_prompt_cache_min_tokens_by_model(model, expected):
+    """Cache minimums follow the model family."""
+    assert prompt_builder._prompt_cache_min_tokens(model) == expected
+
+
+def test_few_shot_examples_only_when_prefix_is_cacheable(monkeypatch):
+    """Examples are sent only when the prefix reaches the model's cache minimum, unless overridden."""
+    monkeypatch.setattr(settings, "prompt_few_shot_examples", None)
+    monkeypatch.setattr(settings, "claude_model", "claude-3-5-haiku-20241022")
+    assert not prompt_builder._use_few_shot(2047)
+    assert prompt_builder._use_few_shot(2048)
+    monkeypatch.setattr(settings, "prompt_few_shot_examples", True)
+    assert prompt_builder._use_few_shot(10)
+    monkeypatch.setattr(settings, "prompt_few_shot_examples", False)
+    assert not prompt_builder._use_few_shot(10_000)
+
+
+def test_static_prefix_tokens_match_prefix():
+    """The precomputed prefix token count is the count of the prefix actually sent."""
+    assert PromptBuilder.static_prefix_tokens() == PromptBuilder.estimate_tokens(PromptBuilder.get_static_prefix())
+
+
+def _byte_encoding():
+    """Offline stand-in for cl100k_base: one token per byte, no merges."""
+    import tiktoken
+
+    return tiktoken.Encoding(
+        name="bytes",
+        pat_str=r"\S+|\s+",
+        mergeable_ranks={bytes([i]): i for i in range(256)},
+        special_tokens={},
+    )
+
+
+def test_estimate_tokens_uses_tokenizer(monkeypatch):
+    """With a tokenizer loaded, counts come from it rather than the 4-characters rule."""
+    monkeypatch.setattr(prompt_builder, "_encoding", _byte_encoding())
+    assert PromptBuilder.estimate_tokens("abcdefgh") == 8
+    assert PromptBuilder.estimate_tokens_batch(["ab", "héllo"]) == [2, 6]
+    monkeypatch.setattr(prompt_builder, "_encoding", None)
+    assert PromptBuilder.estimate_tokens("abcdefgh") == 2
+
+
+def test_truncate_if_needed_keeps_head_and_tail(monkeypatch):
+    """Text over budget keeps its beginning and end around a marker; text within budget is unchanged."""
+    monkeypatch.setattr(prompt_builder, "_encoding", _byte_encoding())
+    text = "a" * 500 + "é" * 500 + "z" * 500
+    assert PromptBuilder.truncate_if_needed("short", max_tokens=100) == "short"
+    truncated = PromptBuilder.truncate_if_needed(text, max_tokens=100)
+    assert truncated.startswith("a" * 50)
+    assert truncated.endswith("z" * 50)
+    assert "content truncated" in truncated
+    assert "é" not in truncated
+
+
+def test_truncate_if_needed_without_tokenizer(monkeypatch):
+    """Without a tokenizer the cut is by characters at ~4 per token."""
+    monkeypatch.setattr(prompt_builder, "_encoding", None)
+    text = "a" * 400 + "é" * 400 + "z" * 400
+    truncated = PromptBuilder.truncate_if_needed(text, max_tokens=100)
+    assert truncated.startswith("a")
+    assert truncated.endswith("z")
+    assert "content truncated" in truncated
+    assert len(truncated) < len(text)
+
+
+def test_token_counts_never_load_the_tokenizer(monkeypatch):
+    """Counting on the request path uses the estimate until the tokenizer is loaded; it never downloads."""
+    def get_encoding(name):
+        raise AssertionError("tokenizer loaded on the request path")
+
+    monkeypatch.setattr(prompt_builder, "_encoding", None)
+    monkeypatch.setattr(prompt_builder.tiktoken, "get_encoding", get_encoding)
+    assert PromptBuilder.estimate_tokens("abcdefgh") == 2
+    assert PromptBuilder.static_prefix_tokens() == len(PromptBuilder.get_static_prefix()) // 4
+
+
+def test_failed_tokenizer_load_is_retried(monkeypatch):
+    """A failed load is not remembered: the next load_encoding call tries again."""
+    encoding = _byte_encoding()
+    outcomes = [OSError("network down"), encoding]
+
+    def get_encoding(name):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(prompt_builder, "_encoding", None)
+    monkeypatch.setattr(prompt_builder.tiktoken, "get_encoding", get_encoding)
+    assert prompt_builder.load_encoding() is None
+    assert prompt_builder._get_encoding() is None
+    assert prompt_builder.load_encoding() is encoding
+    assert prompt_builder._get_encoding() is encoding
+
+
+@pytest.mark.asyncio
+async def test_warm_up_retries_with_backoff_and_measures_prefix(monkeypatch):
+    """warm_up keeps retrying with doubling delays, then counts the prefix with the loaded tokenizer."""
+    encoding = _byte_encoding()
+    outcomes = [OSError("network down"), OSError("network down"), encoding]
+    sleeps = []
+
+    def get_encoding(name):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+
+    monkeypatch.setattr(prompt_builder, "_encoding", None)
+    monkeypatch.setattr(prompt_builder.tiktoken, "get_encoding", get_encoding)
+    monkeypatch.setattr(prompt_builder.asyncio, "sleep", fake_sleep)
+    await prompt_builder.warm_up()
+
+    assert sleeps == [5.0, 10.0]
+    assert PromptBuilder.static_prefix_tokens() == len(PromptBuilder.get_static_prefix().encode())
+
+
+def test_app_startup_loads_tokenizer(monkeypatch):
+    """The app's startup loads the tokenizer off the event loop before serving."""
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    encoding = _byte_encoding()
+    monkeypatch.setattr(prompt_builder, "_encoding", None)
+    monkeypatch.setattr(prompt_builder.tiktoken, "get_encoding", lambda name: encoding)
+    with TestClient(app) as client:
+        assert prompt_builder._get_encoding() is encoding
+        assert client.get("/api/v1/health").status_code == 200
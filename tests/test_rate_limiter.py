@@ -0,0 +1,131 @@
+"""Tests for the RPM/TPM token bucket and the adaptive concurrency limiter."""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import rate_limiter
+from app.services.rate_limiter import AdaptiveConcurrencyLimiter, RateLimiter
+
+
+class FakeClock:
+    """Monotonic clock the test advances by hand; sleep() advances it instead of waiting."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", SimpleNamespace(monotonic=fake.monotonic))
+    monkeypatch.setattr(rate_limiter.asyncio, "sleep", fake.sleep)
+    return fake
+
+
+def test_rpm_bucket_starts_full_and_refills(clock):
+    """A full minute's requests go through at once; then one more frees up every 60/RPM seconds."""
+    limiter = RateLimiter(requests_per_minute=6)
+    for _ in range(6):
+        assert limiter._try_reserve(0) == 0
+    assert limiter._try_reserve(0) == pytest.approx(10.0)
+    clock.now += 5.0
+    assert limiter._try_reserve(0) == pytest.approx(5.0)
+    clock.now += 5.0
+    assert limiter._try_reserve(0) == 0
+
+
+def test_tpm_bucket_refills_continuously(clock):
+    """Tokens refill at TPM/60 per second and never beyond a full bucket."""
+    limiter = RateLimiter(requests_per_minute=100, tokens_per_minute=600)
+    assert limiter._try_reserve(500) == 0
+    # 100 tokens left; 300 more need 200 / (600/60) = 20 seconds
+    assert limiter._try_reserve(300) == pytest.approx(20.0)
+    clock.now += 20.0
+    assert limiter._try_reserve(300) == 0
+    clock.now += 3600.0
+    limiter._try_reserve(0)
+    assert limiter._token_allowance == pytest.approx(600.0)
+
+
+def test_request_larger_than_bucket_is_clamped(clock):
+    """A call estimated above the whole TPM budget waits for a full bucket instead of forever."""
+    limiter = RateLimiter(requests_per_minute=100, tokens_per_minute=600)
+    assert limiter._try_reserve(10_000) == 0
+    assert limiter._token_allowance == pytest.approx(0.0)
+    assert limiter._try_reserve(10_000) == pytest.approx(60.0)
+
+
+@pytest.mark.asyncio
+async def test_aacquire_waits_when_exhausted(clock):
+    """aacquire sleeps for the reported wait and then admits the call."""
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=600)
+    await limiter.aacquire(600)
+    assert clock.sleeps == []
+    await limiter.aacquire(300)
+    assert clock.sleeps == [pytest.approx(30.0)]
+    await limiter.acquire()
+    assert clock.sleeps == [pytest.approx(30.0)]
+
+
+def test_aimd_increases_additively_and_halves_on_overload(clock):
+    """Successes add `increase` up to the maximum; an overload multiplies by `decrease`."""
+    limiter = AdaptiveConcurrencyLimiter(initial=4, minimum=1, maximum=6)
+    for _ in range(2):
+        limiter.on_success(100.0)
+    assert limiter.limit == 5
+    for _ in range(10):
+        limiter.on_success(100.0)
+    assert limiter.limit == 6
+    limiter.on_overload()
+    assert limiter.limit == 3
+
+
+def test_overload_decrease_once_per_cooldown_and_floored(clock):
+    """A burst of overloads within the cooldown shrinks the limit once; it never drops below the minimum."""
+    limiter = AdaptiveConcurrencyLimiter(initial=8, minimum=3, cooldown_seconds=5.0)
+    limiter.on_overload()
+    limiter.on_overload()
+    clock.now += 4.9
+    limiter.on_overload()
+    assert limiter.limit == 4
+    clock.now += 0.1
+    limiter.on_overload()
+    assert limiter.limit == 3
+    clock.now += 5.0
+    limiter.on_overload()
+    assert limiter.limit == 3
+
+
+def test_p95_latency_over_target_counts_as_overload(clock):
+    """With a latency target, a p95 above it shrinks the limit; below it the limit keeps growing."""
+    limiter = AdaptiveConcurrencyLimiter(initial=4, maximum=20, latency_target_ms=1000.0)
+    for _ in range(9):
+        limiter.on_success(200.0)
+    assert limiter.limit == 8
+    limiter.on_success(200.0)
+    assert limiter.limit == 9
+    # One slow call out of eleven leaves the p95 fast; a second one makes it slow
+    limiter.on_success(5000.0)
+    limiter.on_success(5000.0)
+    assert limiter.limit == 4
+
+
+@pytest.mark.asyncio
+async def test_acquire_blocks_at_limit_until_release():
+    """No more than `limit` slots are handed out; release wakes a waiter."""
+    limiter = AdaptiveConcurrencyLimiter(initial=1)
+    await limiter.acquire()
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    assert not waiter.done()
+    await limiter.release()
+    await asyncio.wait_for(waiter, timeout=1)